@@ -0,0 +1,81 @@
+"""
+Scoring time on inputs that made the list based dedupe quadratic: a body
+pasting 10k unique links and a thread with 2k different commenters.
+Doubling the input must roughly double the time, or this exits with an
+error.
+
+    python -m benchmarks.adversarial_dedupe
+"""
+import random
+import sys
+from tasks import issue_score_calculator
+from tasks.issue_score_calculator import ScoreCalculator
+from benchmarks import payloads, legacy_scoring
+from benchmarks.legacy_scoring import LegacyScoreCalculator
+from benchmarks.timing import best_of, ms
+
+# time(2n) / time(n) is ~2 when linear and ~4 when quadratic
+MAX_GROWTH = 3.0
+
+
+def pasted_links(count, seed=7):
+    rnd = random.Random(seed)
+    lines = ['%s %s' % (payloads.link(rnd), 'http://example.com/log/%s' % i) for i in range(count / 2)]
+    return '\n'.join(lines)
+
+
+def link_issue(count):
+    return {
+        'issue': { 'number': 1, 'title': 'crash log', 'body': pasted_links(count), 'user': { 'login': 'reporter' } },
+        'issue_comments': [],
+        'org_members': [],
+    }
+
+
+def commenter_issue(count, seed=8):
+    rnd = random.Random(seed)
+    return {
+        'issue': { 'number': 1, 'title': 'megathread', 'body': payloads.body(rnd), 'user': { 'login': 'reporter' } },
+        'issue_comments': [{ 'user': { 'login': 'commenter%s' % i }, 'body': payloads.sentence(rnd) } for i in range(count)],
+        'org_members': ['user%s' % i for i in range(40)],
+    }
+
+
+def score(calculator, data):
+    c = calculator(number=1, data=data)
+    c.load_scores()
+    return c.score, c.score_data
+
+
+CASES = (
+    ('get_links', 'links', pasted_links, issue_score_calculator.get_links, legacy_scoring.get_links),
+    ('load_scores', 'links', link_issue, lambda data: score(ScoreCalculator, data), lambda data: score(LegacyScoreCalculator, data)),
+    ('load_scores', 'commenters', lambda count: commenter_issue(count / 5), lambda data: score(ScoreCalculator, data), lambda data: score(LegacyScoreCalculator, data)),
+)
+
+
+def main():
+    failed = False
+    print '%-12s %-12s %12s %12s %12s %8s' % ('helper', 'input', 'legacy', 'current', 'current x2', 'growth')
+    for name, kind, build, current, legacy in CASES:
+        data = build(10000)
+        doubled = build(20000)
+        if current(data) != legacy(data):
+            raise AssertionError('%s differs from the legacy rules on %s' % (name, kind))
+
+        legacy_time = best_of(lambda: legacy(data), repeat=1, number=1)
+        current_time = best_of(lambda: current(data), repeat=3)
+        doubled_time = best_of(lambda: current(doubled), repeat=3)
+        growth = doubled_time / current_time
+
+        print '%-12s %-12s %12s %12s %12s %7.1fx' % (name, kind, ms(legacy_time), ms(current_time), ms(doubled_time), growth)
+        if growth > MAX_GROWTH:
+            failed = True
+
+    if failed:
+        print 'scoring grows faster than linearly with the input'
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
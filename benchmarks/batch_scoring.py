@@ -0,0 +1,57 @@
+"""
+Time to rescore a repo's worth of cached issues one at a time, as the
+maintenance loop does, and in batches over a process pool, as
+tasks.rescore does.
+
+    python -m benchmarks.batch_scoring
+"""
+import multiprocessing
+from tasks import issue_score_calculator, rescore, vector_scores
+from tasks.issue_score_calculator import ScoreCalculator
+from benchmarks import payloads
+from benchmarks.timing import best_of, ms
+
+
+def score_one_by_one(bundles):
+    results = []
+    for bundle in bundles:
+        data = dict(bundle)
+        data['contributor_index'] = issue_score_calculator.get_contributor_index(data['contributors'])
+        c = ScoreCalculator(number=data['issue']['number'], data=data)
+        c.load_scores()
+        results.append(c.to_dict())
+    return results
+
+
+def score_in_pool(pool, processes, bundles, org_members, contributor_index):
+    jobs = [(chunk, org_members, contributor_index) for chunk in rescore.get_chunks(bundles, processes * 4)]
+    return [data for chunk in pool.map(rescore.score_chunk, jobs) for data, features in chunk]
+
+
+def main():
+    bundles = payloads.score_bundles(2000)
+    org_members = bundles[0]['org_members']
+    contributor_index = issue_score_calculator.get_contributor_index(bundles[0]['contributors'])
+    slim = [{ 'issue': b['issue'], 'issue_comments': b['issue_comments'] } for b in bundles]
+
+    expected = score_one_by_one(bundles)
+    if vector_scores.score_issues(slim, org_members, contributor_index) != expected:
+        raise AssertionError('batch scores differ')
+
+    print '%-24s %12s' % ('2000 issues', 'time')
+    print '%-24s %12s' % ('one by one', ms(best_of(lambda: score_one_by_one(bundles), repeat=1, number=1)))
+    print '%-24s %12s' % ('score_issues', ms(best_of(lambda: vector_scores.score_issues(slim, org_members, contributor_index), repeat=1, number=1)))
+
+    processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        if score_in_pool(pool, processes, slim, org_members, contributor_index) != expected:
+            raise AssertionError('pool scores differ')
+        print '%-24s %12s' % ('pool of %s processes' % processes, ms(best_of(lambda: score_in_pool(pool, processes, slim, org_members, contributor_index), repeat=1, number=1)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Size and speed of each cache codec on realistic GitHub payloads.
+
+    python -m benchmarks.cache_codec
+"""
+import util
+from benchmarks import payloads
+from benchmarks.timing import best_of, ms
+
+PAYLOADS = (
+    ('open issues (1000)', payloads.open_issues(1000)),
+    ('issue comments (200)', payloads.issue_comments(200)),
+    ('issue events (100)', payloads.issue_events(100)),
+    ('contributors (400)', payloads.contributors(400)),
+    ('org member logins (300)', ['user%s' % i for i in range(300)]),
+)
+
+CODECS = ['json', 'zlib']
+if util.msgpack is not None:
+    CODECS.append('msgpack')
+
+
+def main():
+    print '%-26s %-8s %12s %8s %12s %12s' % ('payload', 'codec', 'bytes', 'ratio', 'encode', 'decode')
+    for name, data in PAYLOADS:
+        json_size = len(util.encode_cached_data(data, codec='json'))
+        for codec in CODECS:
+            value = util.encode_cached_data(data, codec=codec)
+            assert util.decode_cached_data(value) == data
+
+            encode = best_of(lambda: util.encode_cached_data(data, codec=codec), repeat=3)
+            decode = best_of(lambda: util.decode_cached_data(value), repeat=3)
+            print '%-26s %-8s %12s %7.1f%% %12s %12s' % (name, codec, len(value), 100.0 * len(value) / json_size, ms(encode), ms(decode))
+
+
+if __name__ == '__main__':
+    main()
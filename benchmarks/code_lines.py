@@ -0,0 +1,55 @@
+"""
+Time to count the code lines of multi-megabyte bodies, like pasted logs and
+stack traces, by splitting them into lines as the rules used to, and by
+scanning them in place. Counts must be equal when nothing is cut off.
+
+    python -m benchmarks.code_lines
+"""
+import random
+from tasks.issue_score_calculator import count_code_lines
+from benchmarks.legacy_scoring import LegacyScoreCalculator
+from benchmarks.timing import best_of, ms
+
+legacy_code_lines = LegacyScoreCalculator.total_code_lines.im_func
+
+
+def stack_trace(size, seed=1):
+    rnd = random.Random(seed)
+    lines = ['Error: something went wrong', '```']
+    length = 0
+    while length < size:
+        line = '    at Object.fn%s (http://localhost:8100/lib/ionic/js/ionic.bundle.js:%s:%s)' % (rnd.randint(1, 999), rnd.randint(1, 60000), rnd.randint(1, 80))
+        lines.append(line)
+        length += len(line) + 1
+    lines.append('```')
+    return '\n'.join(lines)
+
+
+def fences(size):
+    return ('text ```code``` ' * (size // 16))
+
+
+def log_lines(size):
+    return ('I/chromium: [INFO:CONSOLE(1)] "deviceready has not fired after 5 seconds."\n' * (size // 75))
+
+
+TEXTS = (
+    ('stack trace in a fence, 4MB', stack_trace(4000000)),
+    ('inline fences, 2MB', fences(2000000)),
+    ('plain log, 4MB', log_lines(4000000)),
+)
+
+
+def main():
+    print '%-30s %12s %12s %12s' % ('body', 'split lines', 'scan', 'scan, 1MB cap')
+    for name, text in TEXTS:
+        if count_code_lines(text, max_chars=len(text)) != legacy_code_lines(None, text):
+            raise AssertionError('code lines differ from the legacy rule: %s' % name)
+        legacy = best_of(lambda: legacy_code_lines(None, text), repeat=3)
+        current = best_of(lambda: count_code_lines(text, max_chars=len(text)), repeat=3)
+        capped = best_of(lambda: count_code_lines(text, max_chars=1000000), repeat=3)
+        print '%-30s %12s %12s %12s' % (name, ms(legacy), ms(current), ms(capped))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Micro-benchmarks of the text analysis helpers, run over the checked-in
+corpus of issue bodies and comments in benchmarks/corpus, realistic ones and
+adversarial ones. Each case records its ops/sec and allocations, and fails
+when it regresses beyond the threshold against the stored baseline.
+
+    python -m benchmarks.micro                  # compare to benchmarks/baseline.json
+    python -m benchmarks.micro get_words        # only the cases starting with get_words
+    python -m benchmarks.micro --save           # record a new baseline
+
+Allocations are the KiB allocated at peak during one op, and need
+tracemalloc (Python 3, or pytracemalloc on a patched Python 2). Without it
+they're recorded as unavailable and not compared: the gc only counts live
+containers, not strings or the allocations freed during the op.
+
+Cases are compared by their ops/sec relative to a calibration loop timed
+in turns with each one, so a baseline recorded on another machine, or on a
+busier one, still compares. On a shared machine the relative speed of a
+case still varies by up to about 20% between runs, which THRESHOLD allows.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import timeit
+from collections import OrderedDict
+from tasks import github_issue_submit
+from tasks.issue_score_calculator import ScoreCalculator, get_words, get_links
+from benchmarks.timing import get_number
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# fraction of its relative speed a case may lose, or of allocations it may add
+THRESHOLD = 0.3
+
+# rounds of timing a case and the calibration loop in turns
+ROUNDS = 9
+
+# KiB a case may add regardless of the threshold, so tiny allocations don't flap
+ALLOCATION_SLACK = 16
+
+
+def load_corpus(path=CORPUS_DIR):
+    """
+    @return: dict of 'bodies', 'comments' and 'adversarial' to lists of
+             (name, text), in file name order
+    """
+    corpus = {}
+    for group in ('bodies', 'comments', 'adversarial'):
+        directory = os.path.join(path, group)
+        corpus[group] = []
+        for file_name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, file_name)) as f:
+                corpus[group].append((os.path.splitext(file_name)[0], f.read().decode('utf-8')))
+    return corpus
+
+
+def get_issues(documents, comments):
+    """
+    @return: list of issue data for each document as its body, titled after
+             its file name and commented on by each of the comments
+    """
+    issue_comments = [{ 'id': i, 'body': text, 'user': { 'login': 'user%s' % i } } for i, (name, text) in enumerate(comments)]
+    issues = []
+    for number, (name, text) in enumerate(documents, 1):
+        issues.append({
+            'issue': {
+                'number': number,
+                'title': name.replace('_', ' '),
+                'body': text,
+                'user': { 'login': 'submitter' },
+                'created_at': '2016-04-01T12:00:00Z',
+                'updated_at': '2016-04-02T12:00:00Z',
+            },
+            'issue_comments': issue_comments,
+            'org_members': ['member'],
+            'contributor_index': { 'submitter': 2 },
+        })
+    return issues
+
+
+def get_cases(corpus):
+    """
+    @return: OrderedDict of each case's name to the function running one op,
+             which covers every document of the case's group
+    """
+    groups = (
+        ('realistic', corpus['bodies'] + corpus['comments'], corpus['bodies']),
+        ('adversarial', corpus['adversarial'], corpus['adversarial']),
+    )
+
+    cases = OrderedDict()
+    for group, documents, bodies in groups:
+        texts = [text for name, text in documents]
+        issues = get_issues(bodies, corpus['comments'])
+        calculator = ScoreCalculator(data={})
+
+        cases['get_words/%s' % group] = each(get_words, texts)
+        cases['get_links/%s' % group] = each(get_links, texts)
+        cases['total_code_lines/%s' % group] = each(calculator.total_code_lines, texts)
+        cases['load_scores/%s' % group] = each(load_scores, issues)
+        cases['add_label_from_content/%s' % group] = each(add_label_from_content, [data['issue'] for data in issues])
+    return cases
+
+
+def each(fn, items):
+    return lambda: [fn(item) for item in items]
+
+
+def load_scores(data):
+    c = ScoreCalculator(number=data['issue']['number'], data=data)
+    c.load_scores()
+    return c.score
+
+
+def add_label_from_content(issue):
+    return github_issue_submit.add_label_from_content('driftyco', 'ionic', issue)
+
+
+def run(names=None):
+    """
+    @param names: only run the cases whose name starts with one of these
+    @return: dict of the allocation method and each case's ops_per_sec,
+             relative_speed and allocations
+    """
+    cases = OrderedDict()
+    for name, fn in get_cases(load_corpus()).iteritems():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        ops_per_sec, relative_speed = time_relative(fn)
+        cases[name] = {
+            'ops_per_sec': round(ops_per_sec, 2),
+            'relative_speed': round(relative_speed, 6),
+            'allocations': get_allocations(fn),
+        }
+
+    return {
+        'python': platform.python_version(),
+        'allocation_method': get_allocation_method(),
+        'cases': cases,
+    }
+
+
+def get_allocation_method():
+    return 'tracemalloc' if tracemalloc else None
+
+
+def get_allocations(fn):
+    """
+    @return: KiB allocated at peak during one call of fn, or None without
+             tracemalloc
+    """
+    if not tracemalloc:
+        return None
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def time_relative(fn, rounds=ROUNDS):
+    """
+    Times fn and the calibration loop in turns, so each pair runs under the
+    same load, whatever else the machine is doing.
+    @return: tuple of fn's best ops/sec, and the median of its ops/sec
+             divided by the calibration loop's in each round
+    """
+    timer, calibration_timer = timeit.Timer(fn), timeit.Timer(calibration_work)
+    number, calibration_number = get_number(timer, 0.1), get_number(calibration_timer, 0.1)
+
+    best = None
+    ratios = []
+    for i in range(rounds):
+        seconds = timer.timeit(number) / number
+        calibration_seconds = calibration_timer.timeit(calibration_number) / calibration_number
+        ratios.append(calibration_seconds / seconds)
+        best = seconds if best is None else min(best, seconds)
+
+    return 1 / best, sorted(ratios)[len(ratios) // 2]
+
+
+def calibration_work():
+    """
+    A fixed pure Python workload, which the cases' ops/sec are divided by.
+    """
+    words = 0
+    for i in xrange(5000):
+        words += len(('issue %s body text' % i).lower().split(' '))
+    return words
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    @return: list of messages for the cases regressed beyond the threshold,
+             empty when every case is within it or has no baseline
+    """
+    method = results.get('allocation_method')
+    compare_allocations = method is not None and method == baseline.get('allocation_method')
+
+    regressions = []
+    for name, case in results['cases'].iteritems():
+        expected = baseline.get('cases', {}).get(name)
+        if not expected:
+            continue
+
+        change = get_change(case, expected)
+        if change < -threshold:
+            regressions.append('%s: %.1f%% slower relative to the calibration loop' % (name, -change * 100))
+
+        if compare_allocations and case['allocations'] is not None and expected.get('allocations') is not None:
+            max_allocations = expected['allocations'] * (1 + threshold) + ALLOCATION_SLACK
+            if case['allocations'] > max_allocations:
+                regressions.append('%s: %s KiB allocated, expected at most %d' % (name, case['allocations'], max_allocations))
+
+    return regressions
+
+
+def get_change(case, expected):
+    """
+    @return: fraction the case's relative speed changed by from the baseline
+    """
+    return case['relative_speed'] / expected['relative_speed'] - 1
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, separators=(',', ': '), sort_keys=True)
+        f.write('\n')
+
+
+def format_allocations(case):
+    if case['allocations'] is None:
+        return 'unavailable'
+    return case['allocations']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the text analysis helpers against a stored baseline.')
+    parser.add_argument('cases', nargs='*', help='only run the cases whose name starts with one of these')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline json file')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='fraction a case may regress by')
+    parser.add_argument('--save', action='store_true', help='record the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    if args.save and args.cases:
+        parser.error('--save records every case, leave out the case names')
+
+    results = run(args.cases)
+    baseline = load_baseline(args.baseline)
+
+    print '%-36s %12s %10s %10s %8s %12s' % ('case', 'ops/sec', 'relative', 'baseline', 'change', 'KiB peak')
+    for name, case in results['cases'].iteritems():
+        expected = ((baseline or {}).get('cases') or {}).get(name)
+        if expected:
+            print '%-36s %12.2f %10.4f %10.4f %+7.1f%% %12s' % (name, case['ops_per_sec'], case['relative_speed'], expected['relative_speed'], get_change(case, expected) * 100, format_allocations(case))
+        else:
+            print '%-36s %12.2f %10.4f %10s %8s %12s' % (name, case['ops_per_sec'], case['relative_speed'], '-', '-', format_allocations(case))
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print 'saved baseline: %s' % args.baseline
+        return 0
+
+    if baseline is None:
+        print 'no baseline to compare to: %s' % args.baseline
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print 'regression, %s' % regression
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
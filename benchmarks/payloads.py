@@ -0,0 +1,197 @@
+"""
+Deterministic GitHub-shaped payloads for the benchmarks: open issue
+listings, comment threads and issue events with full user objects, urls
+and markdown bodies, like the ones the API returns.
+"""
+import random
+
+API = 'https://api.github.com'
+REPO = 'driftyco/ionic'
+
+WORDS = ('ionic', 'angular', 'view', 'scroll', 'when', 'the', 'app', 'crashes', 'android', 'ios',
+         'keyboard', 'modal', 'after', 'update', 'build', 'error', 'undefined', 'is', 'not', 'a',
+         'function', 'header', 'tabs', 'navigation', 'state', 'broken', 'works', 'in', 'browser',
+         'but', 'on', 'device', 'cordova', 'plugin', 'version', 'release', 'expected', 'actual')
+
+LINKS = ('http://codepen.io/%s/pen/%s', 'http://plnkr.co/edit/%s%s', 'https://github.com/driftyco/ionic/issues/%s%s',
+         'http://forum.ionicframework.com/t/%s/%s', 'https://cloud.githubusercontent.com/assets/%s/%s.png',
+         'http://stackoverflow.com/questions/%s/%s', 'https://www.youtube.com/watch?v=%s%s',
+         'http://i.imgur.com/%s%s.gif', 'https://example.com/videos/%s/%s.mp4')
+
+CODE = ('angular.module("app", ["ionic"])',
+        '.controller("MainCtrl", function($scope, $ionicModal) {',
+        '  $scope.items = [];',
+        '  $ionicModal.fromTemplateUrl("modal.html").then(function(modal) {',
+        '    $scope.modal = modal;',
+        '  });',
+        '});',
+        '<ion-content class="has-header">',
+        '  <ion-list><ion-item ng-repeat="item in items">{{item}}</ion-item></ion-list>',
+        '</ion-content>')
+
+STACK = ('TypeError: undefined is not a function',
+         '    at Scope.$digest (http://localhost:8100/lib/ionic/js/ionic.bundle.js:20108:23)',
+         '    at Scope.$apply (http://localhost:8100/lib/ionic/js/ionic.bundle.js:20388:24)',
+         '    at HTMLDocument.<anonymous> (http://localhost:8100/lib/ionic/js/ionic.bundle.js:17908:9)')
+
+LABELS = ('bug', 'feature', 'docs', 'needs reply', 'high priority', 'v1', 'v2', 'platform:ios', 'platform:android')
+
+
+def user(rnd, login=None):
+    login = login or 'user%s' % rnd.randint(1, 2000)
+    user_id = rnd.randint(1, 10000000)
+    url = '%s/users/%s' % (API, login)
+    return {
+        'login': login,
+        'id': user_id,
+        'avatar_url': 'https://avatars.githubusercontent.com/u/%s?v=3' % user_id,
+        'gravatar_id': '',
+        'url': url,
+        'html_url': 'https://github.com/%s' % login,
+        'followers_url': '%s/followers' % url,
+        'following_url': '%s/following{/other_user}' % url,
+        'gists_url': '%s/gists{/gist_id}' % url,
+        'starred_url': '%s/starred{/owner}{/repo}' % url,
+        'subscriptions_url': '%s/subscriptions' % url,
+        'organizations_url': '%s/orgs' % url,
+        'repos_url': '%s/repos' % url,
+        'events_url': '%s/events{/privacy}' % url,
+        'received_events_url': '%s/received_events' % url,
+        'type': 'User',
+        'site_admin': False,
+    }
+
+
+def sentence(rnd, words=12):
+    return ' '.join(rnd.choice(WORDS) for i in range(words))
+
+
+def link(rnd):
+    return rnd.choice(LINKS) % (rnd.randint(1, 99999), rnd.randint(1, 99999))
+
+
+def body(rnd, paragraphs=3):
+    """
+    Markdown text mixing prose, links, issue references, fenced and indented
+    code and stack traces.
+    """
+    parts = []
+    for i in range(paragraphs):
+        kind = rnd.random()
+        if kind < 0.5:
+            parts.append('%s %s (%s) #%s.' % (sentence(rnd), link(rnd), sentence(rnd, 6), rnd.randint(1, 5000)))
+        elif kind < 0.75:
+            parts.append('```\n%s\n```' % '\n'.join(rnd.choice(CODE) for l in range(rnd.randint(3, 12))))
+        elif kind < 0.9:
+            parts.append('\n'.join('    ' + rnd.choice(CODE) for l in range(rnd.randint(2, 6))))
+        else:
+            parts.append('\n'.join(STACK))
+    return '\n\n'.join(parts)
+
+
+def label(name):
+    return {
+        'url': '%s/repos/%s/labels/%s' % (API, REPO, name),
+        'name': name,
+        'color': 'fc2929',
+    }
+
+
+def date(rnd):
+    return '2015-%02d-%02dT%02d:%02d:%02dZ' % (rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+
+
+def issue(rnd, number):
+    url = '%s/repos/%s/issues/%s' % (API, REPO, number)
+    return {
+        'url': url,
+        'labels_url': '%s/labels{/name}' % url,
+        'comments_url': '%s/comments' % url,
+        'events_url': '%s/events' % url,
+        'html_url': 'https://github.com/%s/issues/%s' % (REPO, number),
+        'id': rnd.randint(1, 100000000),
+        'number': number,
+        'title': sentence(rnd, rnd.randint(3, 12)),
+        'user': user(rnd),
+        'labels': [label(rnd.choice(LABELS)) for i in range(rnd.randint(0, 3))],
+        'state': 'open',
+        'locked': False,
+        'assignee': user(rnd) if rnd.random() < 0.2 else None,
+        'milestone': None,
+        'comments': rnd.randint(0, 30),
+        'created_at': date(rnd),
+        'updated_at': date(rnd),
+        'closed_at': None,
+        'body': body(rnd, rnd.randint(1, 6)),
+    }
+
+
+def comment(rnd, number, login=None):
+    comment_id = rnd.randint(1, 100000000)
+    return {
+        'url': '%s/repos/%s/issues/comments/%s' % (API, REPO, comment_id),
+        'html_url': 'https://github.com/%s/issues/%s#issuecomment-%s' % (REPO, number, comment_id),
+        'issue_url': '%s/repos/%s/issues/%s' % (API, REPO, number),
+        'id': comment_id,
+        'user': user(rnd, login),
+        'created_at': date(rnd),
+        'updated_at': date(rnd),
+        'body': body(rnd, rnd.randint(1, 3)),
+    }
+
+
+def event(rnd, number):
+    return {
+        'id': rnd.randint(1, 100000000),
+        'url': '%s/repos/%s/issues/events/%s' % (API, REPO, number),
+        'actor': user(rnd),
+        'event': rnd.choice(('labeled', 'unlabeled', 'referenced', 'assigned', 'mentioned')),
+        'commit_id': None,
+        'created_at': date(rnd),
+        'label': { 'name': rnd.choice(LABELS), 'color': 'fc2929' },
+    }
+
+
+def open_issues(count=1000, seed=1):
+    rnd = random.Random(seed)
+    return [issue(rnd, number) for number in range(1, count + 1)]
+
+
+def issue_comments(count=50, seed=2, number=1):
+    rnd = random.Random(seed)
+    return [comment(rnd, number) for i in range(count)]
+
+
+def issue_events(count=30, seed=3, number=1):
+    rnd = random.Random(seed)
+    return [event(rnd, number) for i in range(count)]
+
+
+def contributors(count=400, seed=4):
+    rnd = random.Random(seed)
+    items = []
+    for i in range(count):
+        contributor = user(rnd, 'contributor%s' % i)
+        contributor['contributions'] = rnd.randint(1, 2000)
+        items.append(contributor)
+    return items
+
+
+def score_bundles(count=100, seed=5, comments=(0, 30)):
+    """
+    The data ScoreCalculator reads for each issue: the issue, its comment
+    thread, the org members and the repo's contributors.
+    """
+    rnd = random.Random(seed)
+    members = ['user%s' % i for i in range(1, 40)]
+    repo_contributors = contributors()
+    bundles = []
+    for number in range(1, count + 1):
+        thread = [comment(rnd, number) for i in range(rnd.randint(*comments))]
+        bundles.append({
+            'issue': issue(rnd, number),
+            'issue_comments': thread,
+            'org_members': members,
+            'contributors': repo_contributors,
+        })
+    return bundles
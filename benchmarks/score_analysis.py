@@ -0,0 +1,38 @@
+"""
+Scoring time of typical issues and of a long comment thread, compared to
+the rules before each document was tokenized once. Scores must be equal.
+
+    python -m benchmarks.score_analysis
+"""
+from tasks.issue_score_calculator import ScoreCalculator
+from benchmarks import payloads
+from benchmarks.legacy_scoring import LegacyScoreCalculator
+from benchmarks.timing import best_of, ms
+
+BUNDLES = (
+    ('typical issues (100)', payloads.score_bundles(100)),
+    ('megathread (400 comments)', payloads.score_bundles(1, seed=6, comments=(400, 400))),
+)
+
+
+def score_all(calculator, bundles):
+    results = []
+    for data in bundles:
+        c = calculator(number=data['issue']['number'], data=data)
+        c.load_scores()
+        results.append((c.score, c.score_data))
+    return results
+
+
+def main():
+    print '%-26s %12s %12s %8s' % ('issues', 'legacy', 'current', 'speedup')
+    for name, bundles in BUNDLES:
+        if score_all(ScoreCalculator, bundles) != score_all(LegacyScoreCalculator, bundles):
+            raise AssertionError('scores differ from the legacy rules: %s' % name)
+        legacy = best_of(lambda: score_all(LegacyScoreCalculator, bundles), repeat=3)
+        current = best_of(lambda: score_all(ScoreCalculator, bundles), repeat=3)
+        print '%-26s %12s %12s %7.1fx' % (name, ms(legacy), ms(current), legacy / current)
+
+
+if __name__ == '__main__':
+    main()
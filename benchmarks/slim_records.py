@@ -0,0 +1,39 @@
+"""
+Cached size, decode time and memory of full GitHub payloads compared to
+their slim records.
+
+    python -m benchmarks.slim_records
+"""
+import sys
+import util
+import projections
+from benchmarks import payloads
+from benchmarks.timing import best_of, ms
+
+PAYLOADS = (
+    ('open issues (1000)', payloads.open_issues(1000), projections.slim_issue),
+    ('issue comments (200)', payloads.issue_comments(200), projections.slim_comment),
+    ('issue events (100)', payloads.issue_events(100), projections.slim_event),
+)
+
+
+def deep_size(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in obj.iteritems())
+    elif isinstance(obj, list):
+        size += sum(deep_size(item) for item in obj)
+    return size
+
+
+def main():
+    print '%-22s %-5s %10s %10s %12s %12s' % ('payload', 'shape', 'json', 'cached', 'decode', 'memory')
+    for name, data, projection in PAYLOADS:
+        for shape, value in (('full', data), ('slim', projections.project(data, projection))):
+            cached = util.encode_cached_data(value)
+            decode = best_of(lambda: util.decode_cached_data(cached), repeat=3)
+            print '%-22s %-5s %10s %10s %12s %12s' % (name, shape, len(util.encode_cached_data(value, codec='json')), len(cached), ms(decode), deep_size(util.decode_cached_data(cached)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import timeit
+
+
+def best_of(fn, repeat=5, number=None):
+    """
+    @return: best seconds per call of fn, calling it enough times per round
+             to take at least ~0.2 seconds when number isn't given
+    """
+    timer = timeit.Timer(fn)
+    if number is None:
+        number = get_number(timer)
+    return min(timer.repeat(repeat, number)) / number
+
+
+def get_number(timer, seconds=0.2):
+    """
+    @return: calls of the timer's fn per round to take at least seconds
+    """
+    number = 1
+    while timer.timeit(number) < seconds:
+        number *= 2
+    return number
+
+
+def ms(seconds):
+    return '%.3f ms' % (seconds * 1000)
@@ -0,0 +1,54 @@
+"""
+Time to score a repo's issues one at a time with the rules as they were
+before they were vectorized, and by extracting their features and combining
+them as NumPy arrays together. Scores and score_data must be equal.
+
+    python -m benchmarks.vector_scoring
+"""
+from datetime import datetime
+from tasks import issue_score_calculator, vector_scores
+from tasks.issue_score_calculator import ScoreCalculator
+from benchmarks import payloads
+from benchmarks.legacy_scoring import LegacyScoreCalculator
+from benchmarks.timing import best_of, ms
+
+# both paths count the days up to the same time
+NOW = datetime.now()
+
+
+def score_one_at_a_time(bundles, org_members, contributors):
+    results = []
+    for bundle in bundles:
+        data = dict(bundle, org_members=org_members, contributors=contributors)
+        c = LegacyScoreCalculator(number=data['issue']['number'], data=data, now=NOW)
+        c.load_scores()
+        results.append(c.to_dict())
+    return results
+
+
+def main():
+    bundles = [{ 'issue': b['issue'], 'issue_comments': b['issue_comments'] } for b in payloads.score_bundles(2000)]
+    org_members = ['user%s' % i for i in range(1, 40)]
+    contributors = payloads.contributors()
+    contributor_index = issue_score_calculator.get_contributor_index(contributors)
+
+    expected = score_one_at_a_time(bundles, org_members, contributors)
+    if vector_scores.score_issues(bundles, org_members, contributor_index, now=NOW) != expected:
+        raise AssertionError('vectorized scores differ from the legacy rules')
+
+    features = []
+    for bundle in bundles:
+        data = dict(bundle, org_members=frozenset(org_members), contributor_index=contributor_index)
+        features.append(ScoreCalculator(data=data, now=NOW).get_features())
+    arrays = vector_scores.get_feature_arrays(features)
+
+    print '%-36s %12s' % ('2000 issues', 'time')
+    print '%-36s %12s' % ('legacy rules, one issue at a time', ms(best_of(lambda: score_one_at_a_time(bundles, org_members, contributors), repeat=1, number=1)))
+    print '%-36s %12s' % ('features and vectorized combine', ms(best_of(lambda: vector_scores.score_issues(bundles, org_members, contributor_index, now=NOW), repeat=1, number=1)))
+    print '%-36s %12s' % ('combine only, from stored features', ms(best_of(lambda: vector_scores.score_features(features))))
+    print '%-36s %12s' % ('combine only, scores array', ms(best_of(lambda: vector_scores.combine(arrays))))
+    print '%-36s %12s' % ('apply_decay to stored scores', ms(best_of(lambda: vector_scores.apply_decay([dict(e, score_data=dict(e['score_data'])) for e in expected]))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Time to rank 5000 issues again under other SCORE_VARS from their stored
+features: decoding the stored json, and comparing the rankings.
+
+    python -m benchmarks.what_if
+"""
+import json
+import random
+from tasks import what_if, vector_scores
+from benchmarks.timing import best_of, ms
+
+
+def stored_features(count=5000, seed=9):
+    rnd = random.Random(seed)
+    stored = {}
+    for number in range(1, count + 1):
+        features = dict((name, rnd.randint(0, 5)) for name in vector_scores.FEATURES)
+        features.update(title_length=rnd.randint(5, 120), body_length=rnd.randint(0, 5000), code_lines=rnd.randint(0, 80),
+                        days_since_creation=rnd.randint(0, 900), days_since_update=rnd.randint(0, 400),
+                        core_team=int(rnd.random() < 0.1), high_priority=int(rnd.random() < 0.05), awaiting_reply=int(rnd.random() < 0.2))
+        stored[str(number)] = json.dumps(features)
+    return stored
+
+
+def main():
+    stored = stored_features()
+    overrides = { 'IMAGE': 50, 'LINK': 0, 'CREATION_DECAY_EXP': 1.3 }
+    score_vars = what_if.get_score_vars(overrides)[0]
+
+    def decode():
+        return dict((int(number), json.loads(features)) for number, features in stored.iteritems())
+
+    def compare():
+        features = decode()
+        numbers = sorted(features)
+        return what_if.compare_rankings(numbers, [features[number] for number in numbers], score_vars)
+
+    data = compare()
+    print '%s issues, %s ranked differently' % (len(data['issues']), data['changed'])
+    print '%-28s %12s' % ('decode stored features', ms(best_of(decode, repeat=3)))
+    print '%-28s %12s' % ('decode, combine and compare', ms(best_of(compare, repeat=3)))
+
+
+if __name__ == '__main__':
+    main()
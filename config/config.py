@@ -13,6 +13,85 @@ CONFIG_VARS = {
     # bot's github access token
     'GITHUB_ACCESS_TOKEN': EV('GITHUB_ACCESS_TOKEN'),
 
+    # redis used for the cache and the task queue
+    'REDIS_URL': EV('REDISTOGO_URL', 'redis://localhost:6379'),
+
+    # max connections to redis per process, and seconds to wait for one when they're all in use
+    'REDIS_MAX_CONNECTIONS': int(EV('REDIS_MAX_CONNECTIONS', 20)),
+    'REDIS_POOL_TIMEOUT': 5,
+
+    # max keep-alive connections to api.github.com kept open per worker process
+    'GITHUB_POOL_SIZE': int(EV('GITHUB_POOL_SIZE', 10)),
+
+    # seconds to wait when connecting to, and reading from, api.github.com
+    'GITHUB_CONNECT_TIMEOUT': float(EV('GITHUB_CONNECT_TIMEOUT', 5)),
+    'GITHUB_READ_TIMEOUT': float(EV('GITHUB_READ_TIMEOUT', 30)),
+
+    # calls of the hourly GitHub budget, shared by all processes, kept in reserve
+    'GITHUB_RATE_LIMIT_RESERVE': 50,
+
+    # once less than this fraction of the budget is left, spread the remaining calls evenly until it resets
+    'GITHUB_RATE_LIMIT_LOW': 0.2,
+
+    # longest a single call will wait for the budget, in seconds
+    'GITHUB_RATE_LIMIT_MAX_WAIT': 60*15,
+
+    # times to retry a call rejected by a primary or secondary rate limit
+    'GITHUB_RATE_LIMIT_RETRIES': 2,
+
+    # max pages of a paginated listing to download at the same time
+    'GITHUB_PAGE_WORKERS': int(EV('GITHUB_PAGE_WORKERS', 4)),
+
+    # seconds to wait for another thread or process already fetching the same url
+    'GITHUB_SINGLE_FLIGHT_WAIT': 30,
+
+    # seconds to keep each page's ETag/Last-Modified and payload for conditional requests
+    'GITHUB_VALIDATOR_EXPIRES': 60*60*24*14,
+
+    # longest a page's payload is kept both with its ETag and in the fetch cache. Pages
+    # cached by fetch() for longer keep their ETag only as long as the fetch cache
+    'GITHUB_VALIDATOR_MAX_OVERLAP': 60*60,
+
+    # seconds to also keep cached data in each process's memory, by key pattern. Keys
+    # that don't match aren't kept in memory. Rewritten keys are dropped by every process.
+    'LOCAL_CACHE_TTLS': [
+        ('*:issue:*', 60*5),
+        ('https://api.github.com/*', 60),
+    ],
+
+    # how cached data is stored in redis: 'json', 'zlib' (compressed json) or 'msgpack' (compressed msgpack,
+    # falls back to 'zlib' when msgpack isn't installed)
+    'CACHE_CODEC': EV('CACHE_CODEC', 'msgpack'),
+
+    # only compress cached data at least this long as json, with this zlib level
+    'CACHE_COMPRESS_MIN_BYTES': 1024,
+    'CACHE_COMPRESS_LEVEL': 6,
+
+    # bounds of each process's in-memory cache
+    'LOCAL_CACHE_MAX_ENTRIES': 5000,
+    'LOCAL_CACHE_MAX_BYTES': 1024*1024*32,
+
+    # seconds each process keeps its own copy of an org's members, and of a repo's contributors
+    'ORG_MEMBERS_LOCAL_TTL': 60*10,
+    'CONTRIBUTORS_LOCAL_TTL': 60*10,
+
+    # seconds before a remote template is fetched again, in the background
+    'TEMPLATE_MAX_AGE': 300,
+
+    # seconds to wait when connecting to, and reading from, a template's host
+    'TEMPLATE_TIMEOUT': float(EV('TEMPLATE_TIMEOUT', 10)),
+
+    # run maintenance on every open issue, not only the ones updated since the last run, after $X days
+    'FULL_ISSUE_SYNC_AFTER': 7,
+
+    # keep the text analysis of each issue body and comment for $X seconds, so rescoring an
+    # issue only analyzes its new or edited comments. 'false' analyzes every text every time
+    'SCORE_DOCUMENT_CACHE': EV('SCORE_DOCUMENT_CACHE') != 'false',
+    'SCORE_DOCUMENT_EXPIRES': 60*60*24*30,
+
+    # characters of each issue body or comment scanned for code lines, the rest is ignored
+    'SNIPPET_SCAN_MAX': 1000000,
+
     # close after $X inactive days
     'CLOSE_INACTIVE_AFTER': 90,
 
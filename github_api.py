@@ -1,32 +1,57 @@
 import requests
+import threading
 import util
+import rate_limit
+import projections
 import os
 from config.config import CONFIG_VARS as cvar
 import json
+import copy
+import re
+import time
+import urllib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 GITHUB_AUTH = (cvar['GITHUB_ACCESS_TOKEN'], '')
 GITHUB_API_URL = 'https://api.github.com'
-
-
-def fetch_open_issues(repo_username, repo_id):
-    open_issues = []
-    issues = fetch('/repos/%s/%s/issues?' % (repo_username, repo_id), 0)
-    if isinstance(issues, list):
-        for issue in issues:
-            open_issues.append(issue)
-    return open_issues
+GITHUB_TIMEOUT = (cvar['GITHUB_CONNECT_TIMEOUT'], cvar['GITHUB_READ_TIMEOUT'])
+PAGE_PARAM_RE = re.compile(r'([?&])page=(\d+)')
+RELEASE_LOCK_SCRIPT = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def fetch_open_issues(repo_username, repo_id, since=None, labels=None):
+    """
+    The repo's open issues, with the pages of the listing downloaded
+    concurrently. Raises FetchError when the listing couldn't be downloaded,
+    so callers can tell an incomplete listing from a repo without issues.
+    """
+    params = []
+    if labels:
+        params.append(('labels', labels))
+    if since:
+        params.append(('since', since))
+    issues = fetch('/repos/%s/%s/issues?%s' % (repo_username, repo_id, urllib.urlencode(params)), 0, projection=projections.slim_issue)
+    if not isinstance(issues, list):
+        print 'fetch_open_issues error, %s/%s: %s' % (repo_username, repo_id, issues.get('error'))
+        raise FetchError(issues)
+    return issues
 
 
 def fetch_issue(repo_username, repo_id, number):
-    return fetch('/repos/%s/%s/issues/%s' % (repo_username, repo_id, number))
+    return fetch('/repos/%s/%s/issues/%s' % (repo_username, repo_id, number), projection=projections.slim_issue)
 
 
 def fetch_issue_comments(repo_username, repo_id, number):
-    return fetch('/repos/%s/%s/issues/%s/comments' % (repo_username, repo_id, number))
+    return fetch('/repos/%s/%s/issues/%s/comments' % (repo_username, repo_id, number), projection=projections.slim_comment)
 
 
 def fetch_issue_events(repo_username, repo_id, number):
-    return fetch('/repos/%s/%s/issues/%s/events' % (repo_username, repo_id, number))
+    return fetch('/repos/%s/%s/issues/%s/events' % (repo_username, repo_id, number), projection=projections.slim_event)
 
 
 def fetch_user(login):
@@ -37,9 +62,75 @@ def fetch_repo_contributors(repo_username, repo_id):
     return fetch('/repos/%s/%s/contributors' % (repo_username, repo_id), 60*60*24*7)
 
 
-def fetch_repos_with_issues(repo_username):
+def get_repo_contributor_index(repo_username, repo_id):
+    """
+    Contributions to the repo by login, kept as a redis hash and as a dict in
+    each process. On a miss the contributors are downloaded right away, so
+    scores aren't saved without their contribution points.
+    @return: dict of login to contributions, empty when they couldn't be fetched
+    """
+    cache_key = get_contributors_cache_key(repo_username, repo_id)
+
+    index = get_local_contributor_index(cache_key)
+    if index is not None:
+        return index
+
+    index = util.get_cached_hash(cache_key)
+    if index is not None:
+        return set_local_contributor_index(cache_key, dict((login, int(contributions)) for login, contributions in index.iteritems()))
+
+    return refresh_repo_contributors(repo_username, repo_id) or {}
+
+
+def refresh_repo_contributors(repo_username, repo_id):
+    contributors = fetch('/repos/%s/%s/contributors' % (repo_username, repo_id), 0)
+    if not isinstance(contributors, list):
+        print 'refresh_repo_contributors, %s/%s: %s' % (repo_username, repo_id, contributors)
+        return
+
+    index = {}
+    for contributor in contributors:
+        login = contributor.get('login')
+        if login and login not in index:
+            index[login] = contributor.get('contributions') or 0
+
+    cache_key = get_contributors_cache_key(repo_username, repo_id)
+    util.set_cached_hash(cache_key, index, 60*60*24*7)
+    set_local_contributor_index(cache_key, index)
+
+    print 'refresh_repo_contributors, %s/%s: %s' % (repo_username, repo_id, len(index))
+    return index
+
+
+def get_contributors_cache_key(repo_username, repo_id):
+    return '%s:%s:contributors' % (repo_username, repo_id)
+
+
+_contributor_indexes = {}
+_contributor_indexes_lock = threading.Lock()
+
+
+def get_local_contributor_index(cache_key, now=None):
+    if now is None:
+        now = time.time()
+    with _contributor_indexes_lock:
+        entry = _contributor_indexes.get(cache_key)
+    if entry and entry[1] > now:
+        return entry[0]
+
+
+def set_local_contributor_index(cache_key, index, ttl=cvar['CONTRIBUTORS_LOCAL_TTL']):
+    with _contributor_indexes_lock:
+        _contributor_indexes[cache_key] = (index, time.time() + ttl)
+    return index
+
+
+def fetch_repos_with_issues(repo_username, cached_only=False):
     repos = []
-    data = fetch('/orgs/%s/repos' % (repo_username))
+    if cached_only:
+        data = fetch_cached('/orgs/%s/repos' % (repo_username)) or []
+    else:
+        data = fetch('/orgs/%s/repos' % (repo_username))
 
     skip_repos = []
     skip_repos_env = os.getenv('SKIP_REPOS', '').split(',')
@@ -66,45 +157,91 @@ def fetch_repos_with_issues(repo_username):
 
 
 def fetch_org_members_logins(repo_username):
-    logins = []
+    """
+    Logins of the org's members and of its teams' members. Kept as a redis set
+    for single membership checks, and as a frozenset in each process.
+    @return: frozenset of logins
+    """
     org = repo_username
 
+    logins = get_local_org_members(org)
+    if logins is not None:
+        return logins
+
     cache_key = '%s:members' % (org)
     cached_data = util.get_cached_data(cache_key)
     if cached_data is not None:
-        return cached_data
+        return set_local_org_members(org, cached_data)
 
+    logins = set()
     try:
         org_members = fetch('/orgs/%s/members' % org, 60*60*24*7)
         if not isinstance(org_members, list):
-            logins.append(org)
-            util.set_cached_data(cache_key, logins, 60*60*24*7)
-            return logins
+            logins.add(org)
+            cache_org_members(org, logins)
+            return set_local_org_members(org, logins)
 
         for org_member in org_members:
-            logins.append(org_member.get('login'))
+            logins.add(org_member.get('login'))
 
         org_teams = fetch('/orgs/%s/teams' % org, 60*60*24*7)
-        for org_team in org_teams:
-            org_team_members = fetch('/teams/%s/members' % (org_team.get('id')), 60*60*24*7)
+        if isinstance(org_teams, list) and len(org_teams):
+            team_paths = ['/teams/%s/members' % (org_team.get('id')) for org_team in org_teams]
+            with ThreadPoolExecutor(max_workers=min(cvar['GITHUB_PAGE_WORKERS'], len(team_paths))) as executor:
+                teams_members = list(executor.map(lambda path: fetch(path, 60*60*24*7), team_paths))
 
-            for org_team_member in org_team_members:
-                team_member_login = org_team_member.get('login')
-                if team_member_login not in logins:
-                    logins.append(team_member_login)
+            for org_team_members in teams_members:
+                if isinstance(org_team_members, list):
+                    for org_team_member in org_team_members:
+                        logins.add(org_team_member.get('login'))
 
         if len(logins):
-            util.set_cached_data(cache_key, logins, 60*60*24*7)
+            cache_org_members(org, logins)
 
     except Exception as ex:
         print 'fetch_org_members_logins, %s' % ex
+        # not kept in the process either, the next call fetches them again
+        return frozenset(logins)
+
+    return set_local_org_members(org, logins)
+
 
+def cache_org_members(org, logins):
+    util.set_cached_data('%s:members' % (org), sorted(logins), 60*60*24*7)
+    util.set_cached_set('%s:members:set' % (org), logins, 60*60*24*7)
+
+
+_org_members = {}
+_org_members_lock = threading.Lock()
+
+
+def get_local_org_members(org, now=None):
+    if now is None:
+        now = time.time()
+    with _org_members_lock:
+        entry = _org_members.get(org)
+    if entry and entry[1] > now:
+        return entry[0]
+
+
+def set_local_org_members(org, logins, ttl=cvar['ORG_MEMBERS_LOCAL_TTL']):
+    logins = frozenset(logins)
+    with _org_members_lock:
+        _org_members[org] = (logins, time.time() + ttl)
     return logins
 
 
 def is_org_member(repo_username, login):
+    org_member_logins = get_local_org_members(repo_username)
+    if org_member_logins is not None:
+        return login in org_member_logins
+
+    is_member = util.is_cached_set_member('%s:members:set' % (repo_username), login)
+    if is_member is not None:
+        return is_member
+
     org_member_logins = fetch_org_members_logins(repo_username)
-    if isinstance(org_member_logins, list):
+    if org_member_logins:
         return login in org_member_logins
     return login == repo_username
 
@@ -117,7 +254,52 @@ def is_org_admin_membership(repo_username, login):
     return False
 
 
-def fetch(path, expires=180):
+def get_session():
+    """
+    Process-wide keep-alive session shared by every call to api.github.com.
+    Threads share the session's connection pool (blocking when all
+    GITHUB_POOL_SIZE connections are busy). A forked process, such as an RQ
+    work horse, gets its own session so sockets are never shared.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                session.auth = GITHUB_AUTH
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                        pool_maxsize=cvar['GITHUB_POOL_SIZE'],
+                                                        pool_block=True)
+                session.mount(GITHUB_API_URL, adapter)
+                _session = session
+                _session_pid = pid
+
+    return _session
+
+
+def github_request(method, url, **kwargs):
+    """
+    Every call to api.github.com goes through the shared rate limit budget,
+    and is retried after waiting when GitHub rejects it for rate limiting.
+    """
+    kwargs.setdefault('timeout', GITHUB_TIMEOUT)
+
+    for attempt in range(cvar['GITHUB_RATE_LIMIT_RETRIES'] + 1):
+        rate_limit.wait_for_budget()
+        r = get_session().request(method, url, **kwargs)
+
+        if r.status_code == 304:
+            rate_limit.refund_call()
+
+        if not rate_limit.record_response(r):
+            break
+
+    return r
+
+
+def fetch(path, expires=180, projection=None):
     try:
         url = '%s%s' % (GITHUB_API_URL, path)
 
@@ -127,51 +309,338 @@ def fetch(path, expires=180):
 
             if cached_data is not None:
                 print 'fetched from cache: %s' % path
+                count_fetch_stat('hits')
                 return cached_data
 
-        print 'fetch: %s' % path
+        return single_flight(url, lambda: download(path, url, expires, projection), wait_for_cache=expires > 0)
 
-        data = None
-        try:
-            r = requests.get(url, auth=GITHUB_AUTH)
-            if r.status_code == 204:
-                print 'fetch %s, status_code: 204, no content' % (url)
-                data = { 'error': 'no content' }
-            elif r.status_code < 204:
-                data = r.json()
-            else:
-                return { 'error': r.text, 'status_code': r.status_code }
-
-        except Exception as ex:
-            print 'fetch error, %s:, %s' % (path, ex)
-            return { 'error': '%s' % ex, 'fetch': url }
-
-        # Iterate through additional pages of data if available
-        has_next = True if 'next' in r.links else False
-        while has_next:
-            try:
-                url = r.links['next']['url']
-                r = requests.get(url, auth=GITHUB_AUTH)
-                if r.status_code < 204:
-                    data += r.json()
-                    has_next = True if 'next' in r.links else False
-                else:
-                    has_next = False
-                    data['error'] = r.text
-                    return data
-
-            except Exception as ex:
-                print 'fetch error, %s:, %s' % (path, ex)
-                return { 'error': '%s' % ex, 'next_fetch': url }
+    except Exception as ex:
+        print 'fetch_data, %s: %s' % (url, ex)
+        return { 'error': '%s' % ex, 'fetch': url }
 
-        if expires > 0:
-            util.set_cached_data(cache_key, data, expires)
 
+def fetch_cached(path):
+    return fetch_cached_many([path])[0]
+
+
+def fetch_cached_many(paths):
+    """
+    The data of previous downloads, without calling GitHub: each path as
+    cached by fetch(), or else its pages as stored with their ETags by
+    fetch_page(), following each stored page's 'next' link. The first pages
+    of all the paths are read with one MGET.
+    @return: list of each path's data, or None when some of it was never
+             downloaded or has expired
+    """
+    urls = ['%s%s' % (GITHUB_API_URL, path) for path in paths]
+    results = util.get_cached_data_many(urls)
+
+    missing = [i for i, data in enumerate(results) if data is None]
+    if not missing:
+        return results
+
+    first_pages = util.get_cached_data_many(['validator:%s' % urls[i] for i in missing])
+    for i, stored in zip(missing, first_pages):
+        if not stored:
+            continue
+
+        data = stored.get('data')
+        next_url = (stored.get('links') or {}).get('next')
+        if next_url:
+            data = list(data)
+        while next_url:
+            stored = util.get_cached_data('validator:%s' % next_url)
+            if not stored:
+                data = None
+                break
+            data += stored.get('data') or []
+            next_url = (stored.get('links') or {}).get('next')
+
+        results[i] = data
+
+    return results
+
+
+def download(path, url, expires, projection=None):
+    print 'fetch: %s' % path
+
+    data, links = fetch_page(url, projection, expires)
+    if is_error(data):
         return data
 
+    page_urls = get_page_urls(links.get('last'))
+    if page_urls:
+        pages = fetch_pages(page_urls, projection, expires)
+        if is_error(pages):
+            return pages
+
+        data = list(data)
+        for page_data in pages:
+            data += page_data
+
+    elif links.get('next'):
+        # Iterate through additional pages of data if available, also when
+        # the last link has no page number to build the other pages' urls from
+        data = list(data)
+        next_url = links.get('next')
+        while next_url:
+            page_data, page_links = fetch_page(next_url, projection, expires)
+            if is_error(page_data):
+                page_data['next_fetch'] = next_url
+                return page_data
+
+            data += page_data
+            next_url = page_links.get('next')
+
+    if expires > 0:
+        util.set_cached_data(url, data, expires)
+
+    return data
+
+
+class Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(url, download_fn, wait_for_cache=False, timeout=cvar['GITHUB_SINGLE_FLIGHT_WAIT']):
+    """
+    Concurrent fetches of the same url share a single call to GitHub. Threads
+    of this process wait for the thread already downloading it. When the
+    result is going to be cached, other processes wait for it to show up in
+    the cache while the redis lock is held, instead of downloading it again.
+    """
+    with _flights_lock:
+        flight = _flights.get(url)
+        is_leader = flight is None
+        if is_leader:
+            flight = _flights[url] = Flight()
+        else:
+            flight.followers += 1
+
+    if not is_leader:
+        if flight.done.wait(timeout) and flight.result is not None:
+            count_fetch_stat('shared')
+            return copy.deepcopy(flight.result)
+        return download_fn()
+
+    lock_token = None
+    try:
+        if wait_for_cache:
+            lock_token = acquire_fetch_lock(url, timeout)
+            if lock_token is None:
+                cached_data = wait_for_cached_data(url, timeout)
+                if cached_data is not None:
+                    count_fetch_stat('shared')
+                    flight.result = cached_data
+
+        if flight.result is None:
+            flight.result = download_fn()
+
+    finally:
+        if lock_token:
+            release_fetch_lock(url, lock_token)
+        with _flights_lock:
+            _flights.pop(url, None)
+            has_followers = flight.followers > 0
+        flight.done.set()
+
+    # followers copy the shared result, so the leader can't hand out the same object
+    if has_followers:
+        return copy.deepcopy(flight.result)
+    return flight.result
+
+
+def acquire_fetch_lock(url, timeout):
+    """
+    @return: the lock's token, or None if another process holds the lock
+    """
+    token = uuid.uuid4().hex
+    try:
+        if util.get_cache_db().set('fetch_lock:%s' % url, token, ex=int(timeout), nx=True):
+            return token
+        return None
     except Exception as ex:
-        print 'fetch_data, %s: %s' % (url, ex)
-        return { 'error': '%s' % ex, 'fetch': url }
+        print 'acquire_fetch_lock, %s: %s' % (url, ex)
+        return token
+
+
+def release_fetch_lock(url, token):
+    try:
+        db = util.get_cache_db()
+        db.register_script(RELEASE_LOCK_SCRIPT)(keys=['fetch_lock:%s' % url], args=[token])
+    except Exception as ex:
+        print 'release_fetch_lock, %s: %s' % (url, ex)
+
+
+def wait_for_cached_data(url, timeout, interval=0.25):
+    waited = 0
+    while waited < timeout:
+        time.sleep(interval)
+        waited += interval
+        cached_data = util.get_cached_data(url)
+        if cached_data is not None:
+            return cached_data
+        try:
+            if not util.get_cache_db().exists('fetch_lock:%s' % url):
+                return None
+        except Exception:
+            return None
+
+
+def fetch_page(url, projection=None, expires=0):
+    """
+    Fetches a single page, revalidating a previously downloaded copy with
+    If-None-Match/If-Modified-Since. A 304 reuses the stored page, and GitHub
+    doesn't count it against the rate limit. The page is run through the
+    projection, if given, before it's stored.
+    @param expires: seconds the caller caches the page's data itself, see
+                    get_validator_expires()
+    @return: tuple of the page's data (or an error dict) and its 'next'/'last' page urls
+    """
+    validator_key = 'validator:%s' % url
+    stored = util.get_cached_data(validator_key)
+
+    headers = {}
+    if stored:
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored.get('etag')
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored.get('last_modified')
+
+    try:
+        r = github_request('GET', url, headers=headers)
+
+        if r.status_code == 304 and stored:
+            count_fetch_stat('not_modified')
+            return stored.get('data'), stored.get('links') or {}
+
+        if r.status_code == 204:
+            print 'fetch %s, status_code: 204, no content' % (url)
+            return { 'error': 'no content' }, {}
+
+        if r.status_code > 204:
+            count_fetch_stat('errors')
+            return { 'error': r.text, 'status_code': r.status_code }, {}
+
+        count_fetch_stat('misses')
+        data = r.json()
+        if projection:
+            data = projections.project(data, projection)
+
+        links = {}
+        for rel in ('next', 'last'):
+            if rel in r.links:
+                links[rel] = r.links[rel].get('url')
+
+        etag = r.headers.get('ETag')
+        last_modified = r.headers.get('Last-Modified')
+        if etag or last_modified:
+            util.set_cached_data(validator_key, {
+                'etag': etag,
+                'last_modified': last_modified,
+                'data': data,
+                'links': links
+            }, get_validator_expires(expires))
+
+        return data, links
+
+    except Exception as ex:
+        print 'fetch error, %s: %s' % (url, ex)
+        count_fetch_stat('errors')
+        return { 'error': '%s' % ex, 'fetch': url }, {}
+
+
+def fetch_pages(urls, projection=None, expires=0, max_workers=cvar['GITHUB_PAGE_WORKERS']):
+    """
+    Fetches pages concurrently with a bounded pool of threads.
+    @return: list of each page's data in the order of urls, or the error
+             dict of the first page that failed
+    """
+    if not urls:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+        results = list(executor.map(lambda url: fetch_page(url, projection, expires), urls))
+
+    pages = []
+    for url, (page_data, page_links) in zip(urls, results):
+        if is_error(page_data):
+            page_data['page_fetch'] = url
+            return page_data
+        pages.append(page_data)
+
+    return pages
+
+
+def get_validator_expires(expires, validator_expires=cvar['GITHUB_VALIDATOR_EXPIRES'], max_overlap=cvar['GITHUB_VALIDATOR_MAX_OVERLAP']):
+    """
+    Seconds to keep a page's ETag and payload. Pages the caller caches for a
+    short time, or not at all, keep them long after, for the next conditional
+    request and for fetch_cached(). Pages the caller caches for longer than
+    max_overlap would otherwise be stored twice for all that time, so they
+    keep them only as long as the caller's cache.
+    """
+    if expires > max_overlap:
+        return expires
+    return validator_expires
+
+
+def get_page_urls(last_url):
+    """
+    Builds the urls of pages 2 through the last page from the 'last' link
+    of a paginated response.
+    @return: list of urls, empty when the link has no page number, like a
+             cursor, and the pages have to be followed by their 'next' links
+    """
+    match = PAGE_PARAM_RE.search(last_url or '')
+    if not match:
+        return []
+
+    last_page = int(match.group(2))
+    return [PAGE_PARAM_RE.sub(r'\g<1>page=%s' % page, last_url) for page in range(2, last_page + 1)]
+
+
+class FetchError(Exception):
+    def __init__(self, error):
+        Exception.__init__(self, error.get('error'))
+        self.error = error
+
+
+def is_error(data):
+    return isinstance(data, dict) and data.get('error') is not None
+
+
+_fetch_stats = {
+    'hits': 0,
+    'not_modified': 0,
+    'misses': 0,
+    'errors': 0,
+    'shared': 0,
+}
+_fetch_stats_lock = threading.Lock()
+
+
+def count_fetch_stat(name):
+    with _fetch_stats_lock:
+        _fetch_stats[name] += 1
+
+
+def get_fetch_stats():
+    """
+    Counts for this process: whole responses served from the cache (hits),
+    pages revalidated with a 304 (not_modified), pages downloaded (misses),
+    failed requests (errors) and fetches answered by another thread's or
+    process's download of the same url (shared).
+    """
+    with _fetch_stats_lock:
+        return dict(_fetch_stats)
 
 
 def create_issue_comment(repo_username, repo_id, number, body):
@@ -182,7 +651,7 @@ def create_issue_comment(repo_username, repo_id, number, body):
     try:
         data = { 'body': body }
         url = '%s/repos/%s/%s/issues/%s/comments' % (GITHUB_API_URL, repo_username, repo_id, number)
-        requests.post(url, data=json.dumps(data), auth=GITHUB_AUTH)
+        github_request('POST', url, data=json.dumps(data))
 
     except Exception as ex:
         print 'create_issue_comment, issue %s: %s' % (number, ex)
@@ -196,7 +665,7 @@ def delete_issue_comment(repo_username, repo_id, comment_id, number=None):
 
     try:
         url = '%s/repos/%s/%s/issues/comments/%s' % (GITHUB_API_URL, repo_username, repo_id, comment_id)
-        requests.delete(url, auth=GITHUB_AUTH)
+        github_request('DELETE', url)
 
     except Exception as ex:
         print 'delete_issue_comment, comment_id %s: %s' % (comment_id, ex)
@@ -297,7 +766,7 @@ def issue_edit(repo_username, repo_id, number, title=None, body=None, assignee=N
                 return data
 
             url = url = '%s/repos/%s/%s/issues/%s' % (GITHUB_API_URL, repo_username, repo_id, number)
-            r = requests.patch(url, data=json.dumps(data), auth=GITHUB_AUTH)
+            r = github_request('PATCH', url, data=json.dumps(data))
 
             return r.json()
 
@@ -0,0 +1,69 @@
+"""
+Classifies the links found in issue bodies and comments. Each link is
+parsed once, its extension is looked up in a set and the demo domains are
+matched by one compiled regex, so all of its categories come from a single
+call.
+"""
+import re
+from config.config import CONFIG_VARS as cvar
+
+IMAGE_EXTS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'psd', 'ai'))
+VIDEO_EXTS = frozenset(('mov', 'qt', 'avi', 'wmv', 'mp4', 'm4p', 'm4v', 'mpg', 'mpeg', 'asf', 'webm'))
+
+CATEGORIES = ('image', 'video', 'code_demo', 'forum_link')
+
+
+class LinkClassifier():
+
+    def __init__(self, demo_domains=cvar['DEMO_DOMAINS'], forum_url=cvar['FORUM_URL']):
+        self.forum_url = forum_url
+        self.demo_re = None
+        if demo_domains:
+            self.demo_re = re.compile('|'.join(re.escape(domain) for domain in demo_domains))
+
+
+    def classify(self, link):
+        """
+        @return: dict of each category in CATEGORIES and whether the link is one
+        """
+        if not link:
+            return dict.fromkeys(CATEGORIES, False)
+
+        ext = get_extension(link)
+        return {
+            'image': ext in IMAGE_EXTS,
+            'video': ext in VIDEO_EXTS,
+            'code_demo': self.demo_re is not None and self.demo_re.search(link) is not None,
+            'forum_link': self.forum_url in link,
+        }
+
+
+def get_extension(link):
+    """
+    @return: the lowercased text after the last '.' of the link's path, or
+             None when there's no '.'
+    """
+    if not link:
+        return None
+    link = link.strip().lower().split('?')[0].split('#')[0]
+    dot = link.rfind('.')
+    if dot < 0:
+        return None
+    return link[dot + 1:]
+
+
+classifiers = {}
+
+def get_link_classifier(demo_domains=cvar['DEMO_DOMAINS'], forum_url=cvar['FORUM_URL']):
+    """
+    Classifiers are compiled once per set of domains and kept for the process.
+    """
+    key = (tuple(demo_domains or ()), forum_url)
+    classifier = classifiers.get(key)
+    if classifier is None:
+        classifier = classifiers[key] = LinkClassifier(demo_domains, forum_url)
+    return classifier
+
+
+def classify_link(link):
+    return get_link_classifier().classify(link)
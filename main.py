@@ -8,13 +8,7 @@ from flask.ext.sqlalchemy import SQLAlchemy
 import urlparse
 import requests
 import github_api
-
-
-# Initialize daily/hourly tasks queue loop
-if not cvar['DEBUG']:
-    from tasks.maintenance import queue_daily_tasks
-    threading.Thread(target=queue_daily_tasks).start()
-    threading.Timer(60*60*24, queue_daily_tasks).start()
+import util
 
 app = Flask(__name__, static_folder='static')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['HEROKU_POSTGRESQL_ONYX_URL']
@@ -111,6 +105,26 @@ def get_issue_scores(repo_username, repo_id):
     return Response(json.dumps(data), mimetype='application/json')
 
 
+@app.route("/api/<path:repo_username>/<path:repo_id>/what-if", methods=['GET', 'POST'])
+def what_if(repo_username, repo_id):
+    """
+    Ranks the open issues again under alternate score vars, given as query
+    args or as a json body, and compares it to the live ranking.
+    """
+    data = {}
+    try:
+        from tasks.what_if import simulate
+        if request.data:
+            overrides = json.loads(request.data)
+        else:
+            overrides = dict((name, json.loads(value)) for name, value in request.args.iteritems())
+        data = simulate(repo_username, repo_id, overrides)
+    except Exception as ex:
+        print 'what_if error: %s' % ex
+        data = { 'error' : '%s' % ex }
+    return Response(json.dumps(data), mimetype='application/json')
+
+
 @app.route("/api/<path:repo_username>/<path:repo_id>/<path:number>/issue-response", methods=['POST'])
 def issue_response(repo_username, repo_id, number):
     data = {}
@@ -140,6 +154,21 @@ def api_repos(repo_username):
     return Response(json.dumps(data), mimetype='application/json')
 
 
+@app.route("/api/status", methods=['GET'])
+def api_status():
+    data = {}
+    try:
+        import rate_limit
+        data['github_rate_limit'] = rate_limit.get_status()
+        data['github_fetch_stats'] = github_api.get_fetch_stats()
+        data['cache_stats'] = util.get_cache_stats()
+        data['redis'] = util.check_cache_db()
+    except Exception as ex:
+        print 'api_status error: %s' % ex
+        data = { 'error' : '%s' % ex }
+    return Response(json.dumps(data), mimetype='application/json')
+
+
 @app.route("/webhook", methods=['GET', 'POST', 'OPTIONS'])
 @crossdomain(origin='*', headers=['Content-Type', 'X-Github-Event'])
 def github_webhook():
@@ -163,7 +192,23 @@ def github_webhook():
     return Response(json.dumps(data, sort_keys=True, indent=4, separators=(',', ': ')), mimetype='application/json', status=status)
 
 
+def start_background_tasks():
+    """
+    Started by the web server only, not by the tasks and commands that
+    import main for its db.
+    """
+    # Initialize daily/hourly tasks queue loop
+    if not cvar['DEBUG']:
+        from tasks.maintenance import queue_daily_tasks
+        threading.Thread(target=queue_daily_tasks).start()
+        threading.Timer(60*60*24, queue_daily_tasks).start()
+
+    # Load and compile the response templates before they're needed
+    threading.Thread(target=util.warm_templates).start()
+
+
 if __name__ == "__main__":
+    start_background_tasks()
     port = int(os.environ.get('PORT', 5000))
     print 'Server started, port %s' % port
     app.run(host='0.0.0.0', port=port)
@@ -54,3 +54,18 @@ def get_issue(organization, repo, issue_number):
 
 def get_issues(organization, repo):
     return IssueScore.query.filter_by(organization=organization, repo=repo)
+
+def get_issues_by_numbers(organization, repo, issue_numbers):
+    if not issue_numbers:
+        return []
+    return IssueScore.query.filter_by(organization=organization, repo=repo) \
+                           .filter(IssueScore.issue_number.in_(issue_numbers)).all()
+
+
+def delete_issues_except(organization, repo, issue_numbers):
+    query = IssueScore.query.filter_by(organization=organization, repo=repo)
+    if issue_numbers:
+        query = query.filter(~IssueScore.issue_number.in_(issue_numbers))
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,92 @@
+"""
+Slim records of GitHub issues, comments and events, keeping only the fields
+the tasks and the response templates read. Payloads are projected as each
+page is downloaded, so only slim records are cached and passed around.
+Projecting a slim record again returns the same record.
+"""
+
+
+def project(data, projection):
+    if isinstance(data, list):
+        return [projection(item) for item in data if isinstance(item, dict)]
+    if isinstance(data, dict) and data.get('error') is None:
+        return projection(data)
+    return data
+
+
+def slim_issue(issue):
+    record = {
+        'id': issue.get('id'),
+        'number': issue.get('number'),
+        'title': issue.get('title'),
+        'body': issue.get('body'),
+        'state': issue.get('state'),
+        'html_url': issue.get('html_url'),
+        'user': slim_user(issue.get('user')),
+        'labels': [slim_label(label) for label in issue.get('labels') or []],
+        'assignee': slim_user(issue.get('assignee')),
+        'milestone': slim_milestone(issue.get('milestone')),
+        'comments': issue.get('comments'),
+        'created_at': issue.get('created_at'),
+        'updated_at': issue.get('updated_at'),
+        'closed_at': issue.get('closed_at'),
+    }
+
+    pull_request = issue.get('pull_request')
+    if pull_request is not None:
+        record['pull_request'] = { 'html_url': pull_request.get('html_url') }
+
+    return record
+
+
+def slim_comment(comment):
+    return {
+        'id': comment.get('id'),
+        'body': comment.get('body'),
+        'html_url': comment.get('html_url'),
+        'user': slim_user(comment.get('user')),
+        'created_at': comment.get('created_at'),
+        'updated_at': comment.get('updated_at'),
+    }
+
+
+def slim_event(event):
+    record = {
+        'id': event.get('id'),
+        'event': event.get('event'),
+        'actor': slim_user(event.get('actor')),
+        'created_at': event.get('created_at'),
+    }
+
+    label = event.get('label')
+    if label is not None:
+        record['label'] = slim_label(label)
+
+    return record
+
+
+def slim_user(user):
+    if not user:
+        return None
+    return {
+        'login': user.get('login'),
+        'avatar_url': user.get('avatar_url'),
+        'html_url': user.get('html_url'),
+    }
+
+
+def slim_label(label):
+    return {
+        'name': label.get('name'),
+        'color': label.get('color'),
+    }
+
+
+def slim_milestone(milestone):
+    if not milestone:
+        return None
+    return {
+        'number': milestone.get('number'),
+        'title': milestone.get('title'),
+        'url': milestone.get('url'),
+    }
@@ -0,0 +1,170 @@
+import time
+import util
+from config.config import CONFIG_VARS as cvar
+
+RATE_LIMIT_KEY = 'github:rate_limit'
+BLOCKED_UNTIL_KEY = 'github:rate_limit:blocked_until'
+
+# Only lower the shared remaining count within the same window, since other
+# processes may have already spent calls the response headers don't know about.
+RECORD_SCRIPT = """
+local reset = tonumber(redis.call('HGET', KEYS[1], 'reset') or '0')
+if tonumber(ARGV[3]) > reset then
+    redis.call('HMSET', KEYS[1], 'limit', ARGV[1], 'remaining', ARGV[2], 'reset', ARGV[3])
+else
+    local remaining = tonumber(redis.call('HGET', KEYS[1], 'remaining') or ARGV[2])
+    if tonumber(ARGV[2]) < remaining then
+        redis.call('HSET', KEYS[1], 'remaining', ARGV[2])
+    end
+    redis.call('HSET', KEYS[1], 'limit', ARGV[1])
+end
+redis.call('EXPIREAT', KEYS[1], tonumber(ARGV[3]) + 60)
+"""
+
+
+def wait_for_budget(max_wait=cvar['GITHUB_RATE_LIMIT_MAX_WAIT']):
+    """
+    Called before every GitHub request by every process sharing the token.
+    Takes a call from the shared budget in redis, and sleeps when GitHub asked
+    us to back off, or when the budget is running low.
+    @return: seconds slept
+    """
+    try:
+        wait = reserve_call()
+        if wait > 0:
+            wait = min(wait, max_wait)
+            print 'github rate limit, waiting %.1f seconds' % wait
+            time.sleep(wait)
+        return wait
+
+    except Exception as ex:
+        print 'wait_for_budget, %s' % ex
+        return 0
+
+
+def reserve_call(now=None):
+    """
+    @return: seconds to wait before the reserved call can be made
+    """
+    if now is None:
+        now = time.time()
+
+    db = util.get_cache_db()
+
+    blocked_until = db.get(BLOCKED_UNTIL_KEY)
+    if blocked_until and float(blocked_until) > now:
+        return float(blocked_until) - now
+
+    if not db.exists(RATE_LIMIT_KEY):
+        # nothing learned from GitHub yet for this window
+        return 0
+
+    remaining = db.hincrby(RATE_LIMIT_KEY, 'remaining', -1)
+    limit, reset = db.hmget(RATE_LIMIT_KEY, ['limit', 'reset'])
+    if not limit or not reset:
+        return 0
+
+    return get_wait_seconds(remaining, int(limit), int(reset), now)
+
+
+def get_wait_seconds(remaining, limit, reset, now, reserve=cvar['GITHUB_RATE_LIMIT_RESERVE'], low=cvar['GITHUB_RATE_LIMIT_LOW']):
+    """
+    No wait while plenty of the budget is left. Below the low water mark, the
+    remaining calls are spread evenly until the window resets, and once only
+    the reserve is left, wait for the reset.
+    """
+    seconds_to_reset = max(reset - now, 0)
+
+    if remaining <= reserve:
+        return seconds_to_reset
+
+    if remaining > limit * low:
+        return 0
+
+    return seconds_to_reset / float(remaining - reserve)
+
+
+def refund_call():
+    """
+    Conditional requests answered with a 304 aren't charged by GitHub.
+    """
+    try:
+        db = util.get_cache_db()
+        if db.exists(RATE_LIMIT_KEY):
+            db.hincrby(RATE_LIMIT_KEY, 'remaining', 1)
+    except Exception as ex:
+        print 'refund_call, %s' % ex
+
+
+def record_response(r, now=None):
+    """
+    Learns the real budget from the X-RateLimit headers, and blocks every
+    process when GitHub says the limit was hit or sends a Retry-After
+    (secondary/abuse rate limits).
+    @return: whether the request was rejected because of a rate limit
+    """
+    if now is None:
+        now = time.time()
+
+    try:
+        limit = r.headers.get('X-RateLimit-Limit')
+        remaining = r.headers.get('X-RateLimit-Remaining')
+        reset = r.headers.get('X-RateLimit-Reset')
+
+        db = util.get_cache_db()
+
+        if limit and remaining and reset:
+            db.register_script(RECORD_SCRIPT)(keys=[RATE_LIMIT_KEY], args=[limit, remaining, reset])
+
+        if r.status_code not in (403, 429):
+            return False
+
+        retry_after = r.headers.get('Retry-After')
+        if retry_after:
+            blocked_until = now + int(retry_after)
+        elif remaining == '0' and reset:
+            blocked_until = int(reset)
+        else:
+            # a 403 unrelated to rate limits
+            return False
+
+        print 'github rate limited, status_code: %s, blocked for %s seconds' % (r.status_code, int(blocked_until - now))
+        db.setex(BLOCKED_UNTIL_KEY, blocked_until, max(int(blocked_until - now), 1))
+        return True
+
+    except Exception as ex:
+        print 'record_response, %s' % ex
+
+    return False
+
+
+def get_status(now=None):
+    """
+    The shared budget as seen by all processes, for monitoring.
+    """
+    if now is None:
+        now = time.time()
+
+    try:
+        db = util.get_cache_db()
+        limit, remaining, reset = db.hmget(RATE_LIMIT_KEY, ['limit', 'remaining', 'reset'])
+        blocked_until = db.get(BLOCKED_UNTIL_KEY)
+
+        status = {
+            'limit': int(limit) if limit else None,
+            'remaining': int(remaining) if remaining else None,
+            'reset': int(reset) if reset else None,
+            'blocked_until': float(blocked_until) if blocked_until else None,
+            'wait_seconds': 0,
+        }
+
+        if status['blocked_until'] and status['blocked_until'] > now:
+            status['wait_seconds'] = status['blocked_until'] - now
+        elif status['limit'] and status['remaining'] is not None and status['reset']:
+            status['wait_seconds'] = get_wait_seconds(status['remaining'], status['limit'], status['reset'], now)
+
+        return status
+
+    except Exception as ex:
+        print 'rate limit get_status, %s' % ex
+        return { 'error': '%s' % ex }
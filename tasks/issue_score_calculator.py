@@ -1,17 +1,28 @@
 import datetime
+import hashlib
 import re
 from config.config import CONFIG_VARS as cvar
 import util
+import link_classifier
+import vector_scores
 
+ISSUE_REFERENCE_RE = re.compile(r'#\d+')
+
+# part of the document cache keys, bump it when analyze_text() changes
+DOCUMENT_CACHE_VERSION = 1
 
 class ScoreCalculator():
     """
     An abstraction over a github issue object used to calculate a score.
     """
 
-    def __init__(self, number=None, data={}):
+    def __init__(self, number=None, data={}, cache_documents=False, now=None):
         self.number = number
         self.data = data
+        self.cache_documents = cache_documents
+
+        # the time the age rules are measured at, the time they run when None
+        self.now = now
 
         self.score = 0
         self.number_of_comments = 0
@@ -49,40 +60,32 @@ class ScoreCalculator():
 
         self.number_of_comments = len(self.comments)
 
-        self.org_members = self.data.get('org_members', [])
+        self.org_members = frozenset(self.data.get('org_members') or [])
+
+        self.contributor_index = self.data.get('contributor_index')
+        if self.contributor_index is None:
+            self.contributor_index = get_contributor_index(self.data.get('contributors'))
+
+        self.documents = None
+        self.classified_links = None
 
 
     def load_scores(self):
         """
         Calculates an opinionated score for an issue's priority.
         Priority score will start at 50, and can go up or down.
-        Each function may or may not update the score based on it's result.
-        The algorithm can be tweaked by changing values passed to each method.
-
-        Not the most DRY, but it's explicit and obvious, and beats using a
-        messy hack to call/chain all methods of the instance.
-        @return: the issue's priority score, higher is better
+        The rules are applied to the issue's features by
+        vector_scores.combine(), the same way a whole repo is scored, and
+        can be tweaked by changing SCORE_VARS.
+        @return: whether the issue could be scored
         """
 
         try:
-            self.core_team_member()
-            self.each_contribution()
-            self.short_title_text()
-            self.short_body_text()
-            self.every_x_characters_in_body()
-            self.daily_decay_since_creation()
-            self.daily_decay_since_last_update()
-            self.high_priority()
-            self.awaiting_reply()
-            self.each_unique_commenter()
-            self.each_comment()
-            self.code_snippets()
-            self.code_demos()
-            self.videos()
-            self.images()
-            self.forum_links()
-            self.links()
-            self.issue_references()
+            features = self.get_features()
+            result = vector_scores.score_features([features])[0]
+            self.score += result['score']
+            self.score_data.update(result['score_data'])
+            self.references = features['issue_references']
 
             return True
 
@@ -108,50 +111,150 @@ class ScoreCalculator():
         }
 
 
+    def get_features(self, now=None, demo_domains=cvar['DEMO_DOMAINS'], forum_url=cvar['FORUM_URL']):
+        """
+        The counts, lengths and ages the rules weigh, before any of the
+        SCORE_VARS are applied, so tasks.vector_scores can combine the
+        features of many issues at once.
+        @return: dict of feature name to number (None when a date is missing),
+                 with the issue's created_at and updated_at to age them again
+        """
+        now = self.get_now(now)
+
+        is_member = self.login in self.org_members
+
+        contributions = 0
+        if not is_member:
+            contributions = int(self.contributor_index.get(self.login) or 0)
+
+        label_set = set([l['name'] for l in self.issue.get('labels') or []])
+
+        link_counts = dict.fromkeys(('code_demos', 'videos', 'images', 'forum_links', 'links'), 0)
+        for link, categories in self.get_classified_links(demo_domains, forum_url):
+            if categories['video']:
+                link_counts['videos'] += 1
+            if categories['image']:
+                link_counts['images'] += 1
+            if categories['forum_link']:
+                link_counts['forum_links'] += 1
+            if categories['code_demo'] and not (categories['image'] or categories['video'] or categories['forum_link']):
+                link_counts['code_demos'] += 1
+            if not any(categories.itervalues()):
+                link_counts['links'] += 1
+
+        features = {
+            'core_team': int(is_member),
+            'contributions': contributions,
+            'title_length': len(self.title),
+            'body_length': len(self.body),
+            'days_since_creation': abs((now - self.created_at).days) if self.created_at else None,
+            'days_since_update': abs((now - self.updated_at).days) if self.updated_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'high_priority': int(cvar['HIGH_PRIORITY_LABEL'] in label_set),
+            'awaiting_reply': int(cvar['NEEDS_REPLY_LABEL'] in label_set),
+            'unique_commenters': len(self.get_unique_commenters()),
+            'comments': len(self.data.get('issue_comments') or []),
+            'code_lines': sum(document['code_lines'] for document in self.get_documents()),
+            'issue_references': len(unique(reference for document in self.get_documents() for reference in document['references'])),
+        }
+        features.update(link_counts)
+        return features
+
+
+    ### Text analysis
+
+    def get_documents(self):
+        """
+        The issue body and each comment, tokenized once for all the rules.
+        With cache_documents, the analysis of each text is also kept in redis
+        and only new or edited texts are tokenized again.
+        """
+        if self.documents is None:
+            texts = [self.body] + [c.get('body') if isinstance(c, dict) else None for c in self.comments]
+            if self.cache_documents:
+                self.documents = analyze_texts(texts, self.get_document_cache_keys())
+            else:
+                self.documents = [analyze_text(text) for text in texts]
+        return self.documents
+
+
+    def get_document_cache_keys(self):
+        """
+        Comments are keyed by their id and updated_at, which changes when
+        they're edited, and the issue body by the hash of its text.
+        """
+        cache_keys = [get_document_cache_key(self.body)]
+        for c in self.comments:
+            if not isinstance(c, dict):
+                c = {}
+            if c.get('id') and c.get('updated_at'):
+                cache_keys.append('score:document:%s:comment:%s:%s' % (get_document_cache_version(), c.get('id'), c.get('updated_at')))
+            else:
+                cache_keys.append(get_document_cache_key(c.get('body')))
+        return cache_keys
+
+
+    def get_classified_links(self, demo_domains=cvar['DEMO_DOMAINS'], forum_url=cvar['FORUM_URL']):
+        """
+        @return: list of (link, categories) for each unique link of the issue
+                 and its comments, in order of appearance, each classified once
+        """
+        if demo_domains != cvar['DEMO_DOMAINS'] or forum_url != cvar['FORUM_URL']:
+            classifier = link_classifier.get_link_classifier(demo_domains, forum_url)
+            return [(link, classifier.classify(link)) for link, categories in self.get_classified_links()]
+
+        if self.classified_links is None:
+            links = unique(link for document in self.get_documents() for link in document['links'])
+            self.classified_links = [(link, link_classifier.classify_link(link)) for link in links]
+        return self.classified_links
+
+
+    ### Rules
+
+    def apply_rule(self, name, score_vars, features=None):
+        """
+        Adds the points of one of vector_scores.combine()'s rules to the
+        score, with some of the SCORE_VARS replaced.
+        @param name: the rule's name in score_data
+        @return: the rule's points
+        """
+        if features is None:
+            features = self.get_features()
+
+        terms = vector_scores.combine(vector_scores.get_feature_arrays([features]), dict(cvar, **score_vars))[1]
+        points, listed = terms[name]
+
+        val = vector_scores.get_number(points.tolist()[0])
+        self.score += val
+        if listed[0]:
+            self.score_data[name] = val
+        return val
+
+
     ### Repo / Organization
 
     def core_team_member(self, add=cvar['CORE_TEAM']):
-        if self.login in self.org_members:
-            self.score += add
-            self.score_data['core_team_member'] = add
+        self.apply_rule('core_team_member', { 'CORE_TEAM': add })
 
 
     def each_contribution(self, add=cvar['CONTRIBUTION'], max_contribution=cvar['CONTRIBUTION_MAX']):
-        if self.login in self.org_members:
-            return
-        contributors = self.data.get('contributors')
-        if not contributors or not isinstance(contributors, list):
-            return
-        contrib = [c for c in contributors if self.login == c.get('login')]
-        if contrib and len(contrib):
-            contributions = contrib[0].get('contributions')
-            if contributions:
-                val = int(min(max_contribution, (int(contributions)*add)))
-                self.score += val
-                if val > 0:
-                    self.score_data['each_contribution'] = val
+        self.apply_rule('each_contribution', { 'CONTRIBUTION': add, 'CONTRIBUTION_MAX': max_contribution })
 
 
 
     ### Issue
 
     def short_title_text(self, subtract=cvar['SHORT_TITLE_TEXT_SUBTRACT'], short_title_text_length=cvar['SHORT_TITLE_TEXT_LENGTH']):
-        if len(self.title) < short_title_text_length:
-            self.score -= subtract
-            self.score_data['short_title_text'] = subtract * -1
+        self.apply_rule('short_title_text', { 'SHORT_TITLE_TEXT_SUBTRACT': subtract, 'SHORT_TITLE_TEXT_LENGTH': short_title_text_length })
 
 
     def short_body_text(self, subtract=cvar['SHORT_BODY_TEXT_SUBTRACT'], short_body_text_length=cvar['SHORT_BODY_TEXT_LENGTH']):
-        if len(self.body) < short_body_text_length:
-            self.score -= subtract
-            self.score_data['short_body_text'] = subtract * -1
+        self.apply_rule('short_body_text', { 'SHORT_BODY_TEXT_SUBTRACT': subtract, 'SHORT_BODY_TEXT_LENGTH': short_body_text_length })
 
 
     def every_x_characters_in_body(self, add=cvar['BODY_CHAR_ADD'], x=cvar['BODY_CHAR_X'], max=cvar['BODY_CHAR_MAX']):
-        val = min(self.every_x_chacters(self.body, add, x), max)
-        if val > 0:
-            self.score += val
-            self.score_data['every_x_characters_in_body'] = val
+        self.apply_rule('every_x_characters_in_body', { 'BODY_CHAR_ADD': add, 'BODY_CHAR_X': x, 'BODY_CHAR_MAX': max })
 
 
     def every_x_characters_in_comments(self, add=cvar['COMMENT_CHAR_ADD'], x=cvar['COMMENT_CHAR_X'], max=cvar['COMMENT_CHAR_MAX']):
@@ -173,32 +276,34 @@ class ScoreCalculator():
         return 0
 
 
-    def daily_decay_since_creation(self, exp=cvar['CREATION_DECAY_EXP'], start=cvar['CREATED_START'], now=datetime.datetime.now()):
+    def get_now(self, now=None):
+        if now is not None:
+            return now
+        if self.now is not None:
+            return self.now
+        return datetime.datetime.now()
+
+
+    def daily_decay_since_creation(self, exp=cvar['CREATION_DECAY_EXP'], start=cvar['CREATED_START'], now=None):
         if not self.created_at:
             return
-        days_since_creation = abs((now - self.created_at).days)
-        val = int(float(start) - min((float(days_since_creation)**exp), start))
-        self.score += val
-        if val > 0:
-            self.score_data['daily_decay_since_creation'] = val
+        features = self.get_features(now)
+        val = self.apply_rule('daily_decay_since_creation', { 'CREATION_DECAY_EXP': exp, 'CREATED_START': start }, features)
         return {
-            'days_since_creation': days_since_creation,
+            'days_since_creation': features['days_since_creation'],
             'exp': exp,
             'start': start,
             'score': val
         }
 
 
-    def daily_decay_since_last_update(self, exp=cvar['LAST_UPDATE_DECAY_EXP'], start=cvar['UPDATE_START'], now=datetime.datetime.now()):
+    def daily_decay_since_last_update(self, exp=cvar['LAST_UPDATE_DECAY_EXP'], start=cvar['UPDATE_START'], now=None):
         if not self.updated_at:
             return
-        days_since_update = abs((now - self.updated_at).days)
-        val = int(float(start) - min((float(days_since_update)**exp), start))
-        self.score += val
-        if val > 0:
-            self.score_data['daily_decay_since_last_update'] = val
+        features = self.get_features(now)
+        val = self.apply_rule('daily_decay_since_last_update', { 'LAST_UPDATE_DECAY_EXP': exp, 'UPDATE_START': start }, features)
         return {
-            'days_since_update': days_since_update,
+            'days_since_update': features['days_since_update'],
             'exp': exp,
             'start': start,
             'score': val
@@ -206,273 +311,197 @@ class ScoreCalculator():
 
 
     def high_priority(self, add=cvar['HIGH_PRIORITY']):
-        issue_labels = self.issue.get('labels')
-        if issue_labels:
-            label_set = set([l['name'] for l in issue_labels])
-            if cvar['HIGH_PRIORITY_LABEL'] in label_set:
-                self.score += add
-                self.score_data['high_priority'] = add
+        self.apply_rule('high_priority', { 'HIGH_PRIORITY': add })
 
 
     def awaiting_reply(self, subtract=cvar['AWAITING_REPLY']):
-        issue_labels = self.issue.get('labels')
-        if issue_labels:
-            label_set = set([l['name'] for l in issue_labels])
-            if cvar['NEEDS_REPLY_LABEL'] in label_set:
-                self.score -= subtract
-                self.score_data['awaiting_reply'] = subtract * -1
+        self.apply_rule('awaiting_reply', { 'AWAITING_REPLY': subtract })
 
 
     def each_unique_commenter(self, add=cvar['UNIQUE_USER_COMMENT']):
-        comments = self.data.get('issue_comments')
-        if not comments:
-            return
+        self.apply_rule('each_unique_commenter', { 'UNIQUE_USER_COMMENT': add })
+
 
-        commenters = []
-        for comment in comments:
+    def get_unique_commenters(self):
+        """
+        @return: set of the logins who commented, besides the org members and
+                 the issue's author
+        """
+        commenters = set()
+        for comment in self.comments:
+            if not isinstance(comment, dict):
+                continue
             comment_login = comment.get('user', {}).get('login')
-            if comment_login and comment_login not in commenters and comment_login not in self.org_members:
+            if comment_login and comment_login not in self.org_members:
                 if comment_login != self.login:
-                    commenters.append(comment_login)
-
-        val = len(commenters) * add
-        if val > 0:
-            self.score += val
-            self.score_data['each_unique_commenter'] = val
+                    commenters.add(comment_login)
+        return commenters
 
 
     def each_comment(self, add=cvar['COMMENT']):
-        val = len(self.data.get('issue_comments', [])) * add
-        if val > 0:
-            self.score += val
-            self.score_data['each_comment'] = val
+        self.apply_rule('each_comment', { 'COMMENT': add })
 
 
     def code_snippets(self, add=cvar['SNIPPET'], per_line=cvar['SNIPPET_LINE'], line_max=cvar['SNIPPET_LINE_MAX']):
-        total_code_lines = self.total_code_lines(self.body)
-
-        for c in self.comments:
-            total_code_lines += self.total_code_lines(c.get('body'))
-
-        if total_code_lines > 0:
-            val = add
-            val += min(total_code_lines * per_line, line_max)
-
-            self.score += val
-            self.score_data['code_snippets'] = val
+        self.apply_rule('code_snippets', { 'SNIPPET': add, 'SNIPPET_LINE': per_line, 'SNIPPET_LINE_MAX': line_max })
 
 
     def total_code_lines(self, text):
-        total = 0
-        text = text.replace('```', '\n```')
-        lines = text.split('\n')
-        ticks_on = False
-        for line in lines:
-            if line.startswith('```'):
-                if ticks_on == False:
-                    ticks_on = True
-                else:
-                    ticks_on = False
+        return count_code_lines(text)
 
-            if ticks_on:
-                total += 1
-
-        for line in lines:
-            if line.startswith('    '):
-                total += 1
-
-        return total
 
+    ### Links
 
     def videos(self, add=cvar['VIDEO']):
-        all_videos = get_videos(self.body)
-
-        for c in self.comments:
-            all_videos += get_videos(c.get('body'))
-
-        videos = []
-        for video in all_videos:
-            if video not in videos:
-                videos.append(video)
-
-        val = len(videos) * add
-        self.score += val
-        if val > 0:
-            self.score_data['videos'] = val
+        self.apply_rule('videos', { 'VIDEO': add })
 
 
     def images(self, add=cvar['IMAGE']):
-        all_images = get_images(self.body)
-
-        for c in self.comments:
-            all_images += get_images(c.get('body'))
-
-        images = []
-        for image in all_images:
-            if image not in images:
-                images.append(image)
-
-        val = len(images) * add
-        self.score += val
-        if val > 0:
-            self.score_data['images'] = val
+        self.apply_rule('images', { 'IMAGE': add })
 
 
     def forum_links(self, add=cvar['FORUM_LINK'], forum_url=cvar['FORUM_URL']):
-        all_links = get_links(self.body)
-
-        for c in self.comments:
-            all_links += get_links(c.get('body'))
-
-        links = []
-        for link in all_links:
-            if link not in links and is_forum_link(link, forum_url):
-                links.append(link)
-
-        val = len(links) * add
-        self.score += val
-        if val > 0:
-            self.score_data['forum_links'] = val
+        self.apply_rule('forum_links', { 'FORUM_LINK': add }, self.get_features(forum_url=forum_url))
 
 
     def code_demos(self, add=cvar['DEMO'], demo_domains=cvar['DEMO_DOMAINS']):
-        all_demos = get_code_demos(self.body)
-
-        for c in self.comments:
-            all_demos += get_code_demos(c.get('body'))
-
-        demos = []
-        for demo in all_demos:
-            if demo not in demos and not is_image(demo) and not is_video(demo) and not is_forum_link(demo):
-                demos.append(demo)
-
-        val = len(demos) * add
-        self.score += val
-        if val > 0:
-            self.score_data['code_demos'] = val
+        self.apply_rule('code_demos', { 'DEMO': add }, self.get_features(demo_domains=demo_domains))
 
 
     def links(self, add=cvar['LINK']):
-        all_links = get_links(self.body)
-
-        for c in self.comments:
-            all_links += get_links(c.get('body'))
-
-        links = []
-        for link in all_links:
-            if link not in links and not is_image(link) and not is_video(link) and not is_forum_link(link) and not is_code_demo(link):
-                links.append(link)
-
-        val = len(links) * add
-        self.score += val
-        if val > 0:
-            self.score_data['links'] = val
+        self.apply_rule('links', { 'LINK': add })
 
 
     def issue_references(self, add=cvar['ISSUE_REFERENCE']):
-        all_issue_references = get_issue_references(self.body)
+        features = self.get_features()
+        self.references = features['issue_references']
+        self.apply_rule('issue_references', { 'ISSUE_REFERENCE': add }, features)
 
-        for c in self.comments:
-            all_issue_references += get_issue_references(c.get('body'))
 
-        references = []
-        for reference in all_issue_references:
-            if reference not in references:
-                references.append(reference)
+def analyze_texts(texts, cache_keys, expires=cvar['SCORE_DOCUMENT_EXPIRES']):
+    """
+    analyze_text() of each text, reusing the analysis cached under the text's
+    key. The cached analyses are read with one MGET and the new ones written
+    with one pipeline.
+    """
+    documents = util.get_cached_data_many(cache_keys)
 
-        self.references = len(references)
+    analyzed = []
+    for i, document in enumerate(documents):
+        if document is None:
+            documents[i] = analyze_text(texts[i])
+            analyzed.append((cache_keys[i], documents[i]))
 
-        val = len(references) * add
-        self.score += val
-        if val > 0:
-            self.score_data['issue_references'] = val
+    if analyzed:
+        util.set_cached_data_many(analyzed, expires)
 
+    return documents
 
-def get_issue_references(text):
-    words = get_words(text)
-    references = []
-    for word in words:
-        word = word.replace('.', '')
-        if re.findall(r'#\d+', word):
-            if word not in references:
-                references.append(word)
-    return references
 
+def get_document_cache_key(text):
+    text = text or ''
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return 'score:document:%s:text:%s' % (get_document_cache_version(), hashlib.md5(text).hexdigest())
 
-def get_words(text):
-    if text is None or text == '':
-        return []
 
-    delimiters = ['\n', '\t', ' ', '"', "'", '\(', '\)', '\[', '\]']
-    return re.split('|'.join(delimiters), text.lower())
+def get_document_cache_version():
+    """
+    DOCUMENT_CACHE_VERSION along with the settings analyze_text() reads, so
+    changing them doesn't reuse analyses made under the old ones.
+    """
+    return '%s.%s' % (DOCUMENT_CACHE_VERSION, cvar['SNIPPET_SCAN_MAX'])
 
 
-def get_links(text):
+def analyze_text(text):
+    """
+    Tokenizes a body or comment once for all the rules that read it.
+    @return: dict of the text's unique links and issue references, in order
+             of appearance, and its number of code lines
+    """
     links = []
-    words = get_words(text)
-    for word in words:
-        if word and len(word) > 12:
-            if word.startswith('http://') or word.startswith('https://'):
-                if word not in links:
-                    links.append(word)
-    return links
+    references = []
 
+    for word in get_words(text):
+        if len(word) > 12 and (word.startswith('http://') or word.startswith('https://')):
+            links.append(word)
 
-def get_code_demos(text):
-    code_demos = []
-    links = get_links(text)
-    for link in links:
-        if link not in code_demos and is_code_demo(link):
-            code_demos.append(link)
-    return code_demos
+        if '#' in word:
+            reference = word.replace('.', '')
+            if ISSUE_REFERENCE_RE.search(reference):
+                references.append(reference)
 
+    return {
+        'links': unique(links),
+        'references': unique(references),
+        'code_lines': count_code_lines(text),
+    }
 
-def get_videos(text):
-    videos = []
-    links = get_links(text)
-    for link in links:
-        if link not in videos and is_video(link):
-            videos.append(link)
-    return videos
 
+def count_code_lines(text, max_chars=None):
+    """
+    Counts the lines inside ``` fences, where each ``` also starts a line of
+    its own, and the lines indented by four spaces. The text is scanned in
+    place, from one fence to the next, without splitting it into lines.
+    @param max_chars: only the text before this many characters is counted,
+                      SNIPPET_SCAN_MAX when None
+    """
+    if not text:
+        return 0
 
-def get_images(text):
-    images = []
-    links = get_links(text)
-    for link in links:
-        if link not in images and is_image(link):
-            images.append(link)
-    return images
+    if max_chars is None:
+        max_chars = cvar['SNIPPET_SCAN_MAX']
+    end = min(len(text), max_chars)
 
+    # indented lines, the first line has no newline before it
+    total = text.count('\n    ', 0, end)
+    if text.startswith('    ', 0, end):
+        total += 1
 
-def is_code_demo(link, demo_domains=cvar['DEMO_DOMAINS']):
-    if link:
-        for demo_domain in demo_domains:
-            if demo_domain in link:
-                return True
-    return False
+    # an opening fence counts as a line, and so does every line started
+    # before the next fence closes it
+    fence = text.find('```', 0, end)
+    while fence != -1:
+        closing = text.find('```', fence + 3, end)
+        total += 1 + text.count('\n', fence + 3, end if closing == -1 else closing)
+        if closing == -1:
+            break
+        fence = text.find('```', closing + 3, end)
 
+    return total
 
-def is_forum_link(link, forum_url=cvar['FORUM_URL']):
-    if link:
-        return forum_url in link
-    return False
 
+def get_contributor_index(contributors):
+    index = {}
+    if contributors and isinstance(contributors, list):
+        for contributor in contributors:
+            login = contributor.get('login')
+            if login and login not in index:
+                index[login] = contributor.get('contributions')
+    return index
 
-def is_image(link):
-    image_exts = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.psd', '.ai')
-    return is_file(link, image_exts)
 
+def get_words(text):
+    if text is None or text == '':
+        return []
 
-def is_video(link):
-    video_exts = ('.mov', '.qt', '.avi', '.wmv', '.mp4', '.m4p', '.m4v', '.mpg', '.mpeg', '.asf', '.webm')
-    return is_file(link, video_exts)
+    delimiters = ['\n', '\t', ' ', '"', "'", '\(', '\)', '\[', '\]']
+    return re.split('|'.join(delimiters), text.lower())
 
 
-def is_file(link, possible_extensions):
-    link = link.strip().lower().split('?')[0].split('#')[0]
-    for ext in possible_extensions:
-        if link.endswith(ext):
-            return True
-    return False
+def get_links(text):
+    return unique(word for word in get_words(text) if len(word) > 12 and (word.startswith('http://') or word.startswith('https://')))
 
+
+def unique(items):
+    """
+    @return: list of the items without duplicates, in order of first
+             appearance, using a set so it stays linear for long threads
+    """
+    seen = set()
+    result = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            result.append(item)
+    return result
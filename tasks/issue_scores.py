@@ -5,6 +5,7 @@ import util
 import models
 from main import db
 import issue_score_calculator
+import vector_scores
 
 
 def update_issue_score(repo_username, repo_id, number, data={}):
@@ -20,10 +21,10 @@ def update_issue_score(repo_username, repo_id, number, data={}):
         if not data.get('org_members'):
             data['org_members'] = github_api.fetch_org_members_logins(repo_username)
 
-        if not data.get('contributors'):
-            data['contributors'] = github_api.fetch_repo_contributors(repo_username, repo_id)
+        if not data.get('contributor_index') and not data.get('contributors'):
+            data['contributor_index'] = github_api.get_repo_contributor_index(repo_username, repo_id)
 
-        c = issue_score_calculator.ScoreCalculator(number=number, data=data)
+        c = issue_score_calculator.ScoreCalculator(number=number, data=data, cache_documents=cvar['SCORE_DOCUMENT_CACHE'])
         success = c.load_scores()
 
         if not success:
@@ -32,10 +33,41 @@ def update_issue_score(repo_username, repo_id, number, data={}):
 
         data = c.to_dict()
 
-        cache_key = get_issue_cache_key(repo_username, repo_id, number)
-        util.set_cached_data(cache_key, data, 60*60*24*7)
+        save_issue_scores(repo_username, repo_id, [data], features={ number: c.get_features() })
 
-        issue_score = models.IssueScore(repo_username, repo_id, number)
+        print 'update_issue_score: %s, score: %s' % (number, data.get('score'))
+
+        return data
+
+    except Exception as ex:
+        print 'update_issue_score error, issue %s: %s' % (number, ex)
+        return { 'issue_updated': False, 'issue': number, 'error': '%s' % ex }
+
+
+
+def save_issue_scores(repo_username, repo_id, issue_scores, features=None):
+    """
+    Caches and stores many calculated scores of a repo's issues, with one
+    pipeline to redis and one query for the rows they replace.
+    @param issue_scores: list of ScoreCalculator.to_dict()
+    @param features: dict of issue number to ScoreCalculator.get_features()
+    """
+    if features:
+        vector_scores.save_issue_features(repo_username, repo_id, features)
+
+    if not issue_scores:
+        return
+
+    util.set_cached_data_many([(get_issue_cache_key(repo_username, repo_id, data['number']), data) for data in issue_scores], 60*60*24*7)
+
+    existing = models.get_issues_by_numbers(repo_username, repo_id, [data['number'] for data in issue_scores])
+    if existing:
+        for issue_score in existing:
+            db.session.delete(issue_score)
+        db.session.commit()
+
+    for data in issue_scores:
+        issue_score = models.IssueScore(repo_username, repo_id, data['number'])
         issue_score.score = data['score']
         issue_score.title = data['title']
         issue_score.comments = data['comments']
@@ -47,22 +79,27 @@ def update_issue_score(repo_username, repo_id, number, data={}):
         issue_score.score_data = json.dumps(data['score_data'])
         issue_score.assignee = data['assignee']
         issue_score.milestone = data['milestone']
+        db.session.add(issue_score)
+    db.session.commit()
+
 
+
+def remove_issue_score(repo_username, repo_id, number):
+    """
+    Forgets the score of a closed issue: its row, its cached score and its
+    features, so it isn't ranked by what_if or brought back by a rescore.
+    """
+    try:
         existing = models.get_issue(repo_username, repo_id, number)
         if existing:
             db.session.delete(existing)
             db.session.commit()
 
-        db.session.add(issue_score)
-        db.session.commit()
-
-        print 'update_issue_score: %s, score: %s' % (number, data.get('score'))
-
-        return data
+        util.delete_cached_data(get_issue_cache_key(repo_username, repo_id, number))
+        vector_scores.remove_issue_features(repo_username, repo_id, [number])
 
     except Exception as ex:
-        print 'update_issue_score error, issue %s: %s' % (number, ex)
-        return { 'issue_updated': False, 'issue': number, 'error': '%s' % ex }
+        print 'remove_issue_score error, issue %s: %s' % (number, ex)
 
 
 
@@ -76,40 +113,48 @@ def get_issue_scores(repo_username, repo_id):
             'issues': []
         }
 
-        open_issues = github_api.fetch_open_issues(repo_username, repo_id)
-        if not open_issues or not isinstance(open_issues, list):
+        open_issues = []
+        for issue in github_api.fetch_open_issues(repo_username, repo_id):
+            open_issues.append({
+                'number': issue.get('number'),
+                'milestone': issue.get('milestone'),
+                'pull_request': issue.get('pull_request') is not None,
+            })
+
+        if not open_issues:
             return { 'error': 'Unable to fetch open issues: %s/%s' % (repo_username, repo_id) }
 
-        for issue in open_issues:
-            cache_key = get_issue_cache_key(repo_username, repo_id, issue.get('number'))
-            cached_data = util.get_cached_data(cache_key)
+        cache_keys = [get_issue_cache_key(repo_username, repo_id, issue['number']) for issue in open_issues]
+        cached_issue_scores = util.get_cached_data_many(cache_keys)
 
-            if cached_data:
-                milestone = issue.get('milestone')
-                if milestone:
-                    cached_data['milestone'] = milestone.get('title', '') or ''
+        db_issue_scores = {}
+        missing_numbers = [issue['number'] for issue, cached_data in zip(open_issues, cached_issue_scores) if not cached_data]
+        if missing_numbers:
+            for db_data in models.get_issues_by_numbers(repo_username, repo_id, missing_numbers):
+                db_issue_scores[db_data.issue_number] = db_data
 
-                if issue.get('pull_request') is not None:
-                    cached_data['pull_request'] = True
+        for issue, cached_data, cache_key in zip(open_issues, cached_issue_scores, cache_keys):
+            issue_score = cached_data
+            if not issue_score:
+                db_data = db_issue_scores.get(issue['number'])
+                if db_data:
+                    issue_score = db_data.to_dict()
 
-                data['issues'].append(cached_data)
+            if not issue_score:
+                print 'could not find issue calculation: %s' % (cache_key)
                 continue
 
-            db_data = models.get_issue(repo_username, repo_id, issue.get('number'))
-            if db_data:
-                issue_score = db_data.to_dict()
-
-                milestone = issue.get('milestone')
-                if milestone:
-                    issue_score['milestone'] = milestone.get('title', '') or ''
+            milestone = issue['milestone']
+            if milestone:
+                issue_score['milestone'] = milestone.get('title', '') or ''
 
-                if issue.get('pull_request') is not None:
-                    issue_score['pull_request'] = True
+            if issue['pull_request']:
+                issue_score['pull_request'] = True
 
-                data['issues'].append(issue_score)
-                continue
+            data['issues'].append(issue_score)
 
-            print 'could not find issue calculation: %s' % (cache_key)
+        # the age rules are measured now, not when each issue was last scored
+        vector_scores.apply_decay(data['issues'])
 
         rank_inc = 1
         data['issues'] = sorted(data['issues'], key=lambda k: k['score'], reverse=True)
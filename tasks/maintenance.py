@@ -3,6 +3,7 @@ import util
 from worker import q
 import github_api
 from config.config import CONFIG_VARS as cvar
+from datetime import datetime, timedelta
 
 
 def queue_daily_tasks():
@@ -35,20 +36,19 @@ def run_maintenance_tasks():
             repo_id = repo.get('repo_id')
             print 'Running daily tasks: %s/%s' % (repo_username, repo_id)
 
-            open_issues = []
+            issues_count = 0
             try:
-                open_issues = github_api.fetch_open_issues(repo_username, repo_id)
-                if not open_issues or not isinstance(open_issues, list) or not len(open_issues):
+                github_api.refresh_repo_contributors(repo_username, repo_id)
+                issues_count = sync_repo_issues(repo_username, repo_id)
+
+                if not issues_count:
                     print 'No issues for %s/%s' % (repo_username, repo_id)
                     continue
 
-                for issue in open_issues:
-                    issue_maintenance(repo_username, repo_id, issue)
-
             except Exception as ex:
                 print 'run_maintenance_tasks repo error, %s/%s: %s' % (repo_username, repo_id, ex)
 
-            print "open issues, %s/%s: %s" % (repo_username, repo_id, len(open_issues))
+            print "open issues, %s/%s: %s" % (repo_username, repo_id, issues_count)
 
         set_last_update()
 
@@ -56,6 +56,79 @@ def run_maintenance_tasks():
         print 'run_maintenance_tasks error: %s' % (ex2)
 
 
+def sync_repo_issues(repo_username, repo_id, now=None):
+    """
+    Runs maintenance on the repo's open issues updated since its last
+    successful sync, along with the ones waiting on a reply since those can be
+    closed without being updated. Every FULL_ISSUE_SYNC_AFTER days all open
+    issues are maintained instead, and scores of issues that are no longer
+    open are removed.
+
+    Checks that only depend on time, on issues that nobody touches, wait for
+    the next full sync: removing the resubmit flag comment of
+    github_issue_submit.remove_flag_if_not_updated can happen up to
+    FULL_ISSUE_SYNC_AFTER days after REMOVE_FORM_RESUBMIT_COMMENT_AFTER, since
+    the flag is a comment and there's no label to list those issues by. The
+    age rules of stored scores don't wait, issue_scores applies their decay
+    when the scores are read.
+    @return: number of issues maintained
+    """
+    if now is None:
+        now = datetime.utcnow()
+
+    synced_at_key = get_sync_cache_key(repo_username, repo_id, 'issues_synced_at')
+    full_synced_at_key = get_sync_cache_key(repo_username, repo_id, 'issues_full_synced_at')
+
+    synced_at = util.get_date(util.get_cached_value(synced_at_key))
+    full_sync = synced_at is None or needs_full_sync(util.get_date(util.get_cached_value(full_synced_at_key)), now)
+
+    if full_sync:
+        print 'Full issue sync: %s/%s' % (repo_username, repo_id)
+        issues = github_api.fetch_open_issues(repo_username, repo_id)
+    else:
+        # overlap the previous sync a little in case of clock skew with GitHub
+        since = (synced_at - timedelta(minutes=10)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        print 'Issue sync since %s: %s/%s' % (since, repo_username, repo_id)
+        issues = github_api.fetch_open_issues(repo_username, repo_id, since=since) + \
+                 github_api.fetch_open_issues(repo_username, repo_id, labels=cvar['NEEDS_REPLY_LABEL'])
+
+    open_issues = []
+    numbers = set()
+    for issue in issues:
+        number = issue.get('number')
+        if number in numbers:
+            continue
+        numbers.add(number)
+        open_issues.append(issue)
+
+    for issue in open_issues:
+        issue_maintenance(repo_username, repo_id, issue)
+
+    now_str = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    if full_sync:
+        import models
+        from tasks import vector_scores
+        deleted = models.delete_issues_except(repo_username, repo_id, list(numbers))
+        vector_scores.remove_issue_features_except(repo_username, repo_id, numbers)
+        print 'Removed %s scores of issues no longer open: %s/%s' % (deleted, repo_username, repo_id)
+        util.set_cached_value(full_synced_at_key, now_str, expires=60*60*24*30)
+
+    util.set_cached_value(synced_at_key, now_str, expires=60*60*24*30)
+
+    return len(numbers)
+
+
+def needs_full_sync(full_synced_at, now, full_sync_after=cvar['FULL_ISSUE_SYNC_AFTER']):
+    if not full_synced_at:
+        return True
+    return now - full_synced_at > timedelta(days=full_sync_after)
+
+
+def get_sync_cache_key(repo_username, repo_id, name):
+    return '%s:%s:%s' % (repo_username, repo_id, name)
+
+
 def issue_maintenance_number(repo_username, repo_id, number):
     try:
         issue = github_api.fetch_issue(repo_username, repo_id, number)
@@ -96,6 +169,7 @@ def issue_maintenance(repo_username, repo_id, issue):
             old_issue_data = old_issues.manage_old_issue(repo_username, repo_id, issue)
             if old_issue_data:
                 data['closed_old_issue'] = True
+                issue_scores.remove_issue_score(repo_username, repo_id, number)
                 return data
 
             if github_issue_submit.remove_flag_if_submitted_through_github(repo_username, repo_id, issue):
@@ -108,6 +182,7 @@ def issue_maintenance(repo_username, repo_id, issue):
             if needs_reply_data:
                 data['needs_reply_data'] = needs_reply_data
                 if needs_reply_data.get('close_needs_reply_issue'):
+                    issue_scores.remove_issue_score(repo_username, repo_id, number)
                     return data
 
         data['issue_score'] = issue_scores.update_issue_score(repo_username, repo_id, number, data={
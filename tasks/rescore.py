@@ -0,0 +1,187 @@
+"""
+Rescores the open issues of a repo, or of every repo of an org, from the
+issues, comments, org members and contributors already cached by the
+maintenance tasks, without calling GitHub unless the repo's contributors
+aren't cached. Only issues that still have a stored score are rescored, so
+issues closed since the listing was cached aren't saved again. The issues
+are split between a pool of processes, one per core by default, and each
+chunk is scored with tasks.vector_scores, so new weights in config/score.py
+can be applied to every issue right away.
+
+    python -m tasks.rescore driftyco
+    python -m tasks.rescore driftyco ionic --processes 4
+"""
+import argparse
+import multiprocessing
+import time
+import util
+import github_api
+from config.config import CONFIG_VARS as cvar
+from tasks import vector_scores
+
+
+def rescore_org(repo_username, pool, processes):
+    repos = github_api.fetch_repos_with_issues(repo_username, cached_only=True)
+    if not repos:
+        print 'rescore_org, no cached repos: %s' % repo_username
+        return 0
+
+    return sum(rescore_repo(repo_username, repo.get('repo_id'), pool, processes) for repo in repos)
+
+
+def rescore_repo(repo_username, repo_id, pool, processes):
+    """
+    @return: number of issues rescored
+    """
+    start = time.time()
+
+    bundles = get_cached_bundles(repo_username, repo_id)
+    if not bundles:
+        print 'rescore_repo, no cached issues: %s/%s' % (repo_username, repo_id)
+        return 0
+
+    org_members = get_cached_org_members(repo_username)
+    contributor_index = get_contributor_index(repo_username, repo_id)
+    if contributor_index is None:
+        print 'rescore_repo, unable to fetch contributors, not rescoring: %s/%s' % (repo_username, repo_id)
+        return 0
+
+    jobs = [(chunk, org_members, contributor_index) for chunk in get_chunks(bundles, processes * 4)]
+    scored = [item for chunk in pool.map(score_chunk, jobs) for item in chunk if item[0]]
+    issue_scores = [data for data, features in scored]
+
+    from tasks import issue_scores as issue_scores_task
+    issue_scores_task.save_issue_scores(repo_username, repo_id, issue_scores,
+                                        features=dict((data['number'], features) for data, features in scored))
+
+    print 'rescore_repo, %s/%s: %s issues in %.2f seconds' % (repo_username, repo_id, len(issue_scores), time.time() - start)
+    return len(issue_scores)
+
+
+def get_cached_bundles(repo_username, repo_id):
+    """
+    The open issues of the repo with their comments, as cached by their last
+    download. Issues whose comments aren't cached are skipped, and so are
+    issues without a stored score or features: the cached listing can be
+    older than the last sync, which dropped the issues closed since. Issues
+    last scored from a newer copy than the cached listing's, by an
+    incremental sync or a webhook, are skipped as well.
+    @return: list of dicts with each issue's 'issue' and 'issue_comments'
+    """
+    issues = github_api.fetch_cached('/repos/%s/%s/issues?' % (repo_username, repo_id))
+    if not isinstance(issues, list):
+        return []
+
+    issues = [issue for issue in issues if issue.get('number') and issue.get('closed_at') is None]
+    features = vector_scores.get_issue_features(repo_username, repo_id) or {}
+    known_numbers = get_known_numbers(repo_username, repo_id, [issue.get('number') for issue in issues], features)
+    closed = [issue.get('number') for issue in issues if issue.get('number') not in known_numbers]
+    if closed:
+        print 'rescore, skipping issues no longer scored: %s/%s %s' % (repo_username, repo_id, closed)
+        issues = [issue for issue in issues if issue.get('number') in known_numbers]
+
+    outdated = [issue.get('number') for issue in issues if is_outdated(issue, features.get(issue.get('number')))]
+    if outdated:
+        print 'rescore, skipping issues scored from a newer copy: %s/%s %s' % (repo_username, repo_id, outdated)
+        issues = [issue for issue in issues if issue.get('number') not in outdated]
+
+    comments = github_api.fetch_cached_many(['/repos/%s/%s/issues/%s/comments' % (repo_username, repo_id, issue.get('number')) for issue in issues])
+
+    bundles = []
+    for issue, issue_comments in zip(issues, comments):
+        if issue_comments is None and issue.get('comments'):
+            print 'rescore, comments not cached: %s/%s/%s' % (repo_username, repo_id, issue.get('number'))
+            continue
+        bundles.append({
+            'issue': issue,
+            'issue_comments': issue_comments or [],
+        })
+    return bundles
+
+
+def get_known_numbers(repo_username, repo_id, numbers, features):
+    """
+    @param features: dict of issue number to its stored features
+    @return: set of the numbers with stored features or a score in the db
+    """
+    known = set(features)
+    missing = [number for number in numbers if number not in known]
+    if missing:
+        known.update(get_db_numbers(repo_username, repo_id, missing))
+    return known
+
+
+def is_outdated(issue, issue_features):
+    """
+    @return: whether the issue's stored features were extracted from a copy
+             updated after this one
+    """
+    if not issue_features or not issue_features.get('updated_at'):
+        return False
+    updated_at = util.get_date(issue.get('updated_at'))
+    return updated_at is None or updated_at.isoformat() < issue_features['updated_at']
+
+
+def get_db_numbers(repo_username, repo_id, numbers):
+    import models
+    return [db_data.issue_number for db_data in models.get_issues_by_numbers(repo_username, repo_id, numbers)]
+
+
+def get_contributor_index(repo_username, repo_id):
+    """
+    The repo's contributor index, downloaded now when it isn't cached rather
+    than saving every issue's score without contribution points.
+    @return: dict of login to contributions, or None when it couldn't be fetched
+    """
+    if util.get_cached_hash(github_api.get_contributors_cache_key(repo_username, repo_id)) is None:
+        print 'rescore, contributors not cached, fetching: %s/%s' % (repo_username, repo_id)
+        return github_api.refresh_repo_contributors(repo_username, repo_id)
+    return github_api.get_repo_contributor_index(repo_username, repo_id)
+
+
+def get_cached_org_members(repo_username):
+    org_members = util.get_cached_data('%s:members' % (repo_username))
+    if not isinstance(org_members, list):
+        print 'rescore, org members not cached: %s' % repo_username
+        return frozenset([repo_username])
+    return frozenset(org_members)
+
+
+def get_chunks(items, count):
+    """
+    Splits items into about count lists of consecutive items.
+    """
+    size = max(1, -(-len(items) // max(1, count)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def score_chunk(job):
+    bundles, org_members, contributor_index = job
+    return vector_scores.score_issues_with_features(bundles, org_members, contributor_index, cache_documents=cvar['SCORE_DOCUMENT_CACHE'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rescore open issues from cached GitHub data.')
+    parser.add_argument('repo_username', help='org, or user, owning the repos')
+    parser.add_argument('repo_id', nargs='?', help='only rescore this repo')
+    parser.add_argument('--processes', type=int, default=None, help='scoring processes, defaults to the number of cores')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    processes = args.processes or multiprocessing.cpu_count()
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        if args.repo_id:
+            count = rescore_repo(args.repo_username, args.repo_id, pool, processes)
+        else:
+            count = rescore_org(args.repo_username, pool, processes)
+    finally:
+        pool.close()
+        pool.join()
+
+    print 'rescored %s issues in %.2f seconds' % (count, time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+Scores issues from the features ScoreCalculator.get_features() extracts.
+Each rule's weight, cap and decay exponent from SCORE_VARS is applied to
+one NumPy array holding that feature for every issue. This is the only
+implementation of the rules: ScoreCalculator.load_scores() and its rule
+methods combine the features of a single issue.
+"""
+import datetime
+import json
+from collections import OrderedDict
+import numpy as np
+from config.config import CONFIG_VARS as cvar
+import util
+import issue_score_calculator
+
+FEATURES = ('core_team', 'contributions', 'title_length', 'body_length', 'days_since_creation', 'days_since_update',
+            'high_priority', 'awaiting_reply', 'unique_commenters', 'comments', 'code_lines', 'code_demos', 'videos',
+            'images', 'forum_links', 'links', 'issue_references')
+
+# the rules whose points change with time: score_data name, feature, exponent and start
+DECAY_RULES = (('daily_decay_since_creation', 'days_since_creation', 'CREATION_DECAY_EXP', 'CREATED_START'),
+               ('daily_decay_since_last_update', 'days_since_update', 'LAST_UPDATE_DECAY_EXP', 'UPDATE_START'))
+
+
+def get_feature_arrays(features):
+    """
+    @param features: list of each issue's get_features()
+    @return: dict of feature name to a float array with one value per issue,
+             NaN where a date was missing
+    """
+    arrays = {}
+    for name in FEATURES:
+        arrays[name] = np.array([f.get(name) for f in features], dtype=np.float64)
+    return arrays
+
+
+def combine(arrays, score_vars=cvar):
+    """
+    Applies every scoring rule to the feature arrays.
+    @return: tuple of the score array and an OrderedDict of each rule's name
+             to the points it added to each issue, and to whether those
+             points are listed in the issue's score_data
+    """
+    v = score_vars
+    terms = OrderedDict()
+
+    def term(name, points, applied, listed=None):
+        points = np.where(applied, points, 0)
+        terms[name] = (points, applied & (points > 0) if listed is None else listed)
+
+    def flag(name, points, applied):
+        term(name, points, applied, listed=applied)
+
+    member = arrays['core_team'] > 0
+    flag('core_team_member', v['CORE_TEAM'], member)
+
+    contributions = arrays['contributions']
+    term('each_contribution', np.trunc(np.minimum(v['CONTRIBUTION_MAX'], contributions * v['CONTRIBUTION'])), ~member & (contributions != 0))
+
+    flag('short_title_text', -v['SHORT_TITLE_TEXT_SUBTRACT'], arrays['title_length'] < v['SHORT_TITLE_TEXT_LENGTH'])
+    flag('short_body_text', -v['SHORT_BODY_TEXT_SUBTRACT'], arrays['body_length'] < v['SHORT_BODY_TEXT_LENGTH'])
+
+    body_chars = np.minimum(np.trunc(arrays['body_length'] / float(v['BODY_CHAR_X'])) * v['BODY_CHAR_ADD'], v['BODY_CHAR_MAX'])
+    term('every_x_characters_in_body', body_chars, body_chars > 0)
+
+    for name, feature, exp, start in DECAY_RULES:
+        term(name, *get_decay(arrays[feature], v[exp], v[start]))
+
+    flag('high_priority', v['HIGH_PRIORITY'], arrays['high_priority'] > 0)
+    flag('awaiting_reply', -v['AWAITING_REPLY'], arrays['awaiting_reply'] > 0)
+
+    commenters = arrays['unique_commenters'] * v['UNIQUE_USER_COMMENT']
+    term('each_unique_commenter', commenters, commenters > 0)
+    comments = arrays['comments'] * v['COMMENT']
+    term('each_comment', comments, comments > 0)
+
+    code_lines = arrays['code_lines']
+    flag('code_snippets', v['SNIPPET'] + np.minimum(code_lines * v['SNIPPET_LINE'], v['SNIPPET_LINE_MAX']), code_lines > 0)
+
+    every_issue = np.ones(len(code_lines), dtype=bool)
+    for name, add in (('code_demos', v['DEMO']), ('videos', v['VIDEO']), ('images', v['IMAGE']),
+                      ('forum_links', v['FORUM_LINK']), ('links', v['LINK']), ('issue_references', v['ISSUE_REFERENCE'])):
+        term(name, arrays[name] * add, every_issue)
+
+    scores = np.zeros(len(code_lines))
+    for points, listed in terms.itervalues():
+        scores += points
+
+    return scores, terms
+
+
+def get_decay(days, exp, start):
+    """
+    @param days: array of ages in days, NaN where the date is missing
+    @return: tuple of the decay rule's points, and whether each issue has the date
+    """
+    has_date = ~np.isnan(days)
+    points = np.trunc(float(start) - np.minimum(np.where(has_date, days, 0) ** exp, start))
+    return points, has_date
+
+
+def get_days_since(dates, now):
+    """
+    Whole days between each date and now, like abs((now - date).days).
+    @param dates: list of isoformat date strings, or None
+    @return: float array, NaN where the date is missing or invalid
+    """
+    try:
+        dates = np.array([date or 'NaT' for date in dates], dtype='datetime64[us]')
+    except ValueError:
+        dates = np.array([parse_date(date) for date in dates], dtype='datetime64[us]')
+
+    missing = np.isnat(dates)
+    micros = (np.datetime64(now, 'us') - np.where(missing, np.datetime64(now, 'us'), dates)).astype(np.int64)
+    days = np.abs(np.floor_divide(micros, 24*60*60*1000000)).astype(np.float64)
+    days[missing] = np.nan
+    return days
+
+
+def parse_date(date):
+    try:
+        return np.datetime64(date, 'us')
+    except (ValueError, TypeError):
+        return np.datetime64('NaT')
+
+
+def set_days_since(features, now=None):
+    """
+    Ages stored features again as of now, from their created_at and updated_at.
+    """
+    if not features:
+        return features
+    if now is None:
+        now = datetime.datetime.now()
+
+    for feature, date_name in (('days_since_creation', 'created_at'), ('days_since_update', 'updated_at')):
+        days = get_days_since([f.get(date_name) for f in features], now).tolist()
+        for f, age in zip(features, days):
+            if f.get(date_name):
+                f[feature] = None if age != age else int(age)
+    return features
+
+
+def apply_decay(issue_scores, now=None, score_vars=cvar):
+    """
+    Measures the decay rules of stored scores again as of now, for all of
+    them at once, so rankings stay current without rescoring each issue.
+    The rest of a score doesn't change with time: it's the stored score
+    minus the decay points stored in its score_data.
+    @param issue_scores: list of ScoreCalculator.to_dict(), updated in place
+    """
+    if not issue_scores:
+        return issue_scores
+    if now is None:
+        now = datetime.datetime.now()
+
+    score_datas = [issue_score.get('score_data') or {} for issue_score in issue_scores]
+    scores = np.array([issue_score.get('score') or 0 for issue_score in issue_scores], dtype=np.float64)
+    for name, feature, exp, start in DECAY_RULES:
+        scores -= np.array([score_data.get(name) or 0 for score_data in score_datas], dtype=np.float64)
+
+    decay = []
+    for (name, feature, exp, start), date_name in zip(DECAY_RULES, ('created', 'updated')):
+        points, has_date = get_decay(get_days_since([issue_score.get(date_name) for issue_score in issue_scores], now), score_vars[exp], score_vars[start])
+        points = np.where(has_date, points, 0)
+        scores += points
+        decay.append((name, points.tolist()))
+
+    for i, (issue_score, score_data, score) in enumerate(zip(issue_scores, score_datas, scores.tolist())):
+        issue_score['score'] = get_number(score)
+        for name, points in decay:
+            if points[i] > 0:
+                score_data[name] = get_number(points[i])
+            else:
+                score_data.pop(name, None)
+        issue_score['score_data'] = score_data
+
+    return issue_scores
+
+
+def score_features(features, score_vars=cvar):
+    """
+    @return: list of dicts with each issue's 'score' and 'score_data'
+    """
+    if not features:
+        return []
+
+    scores, terms = combine(get_feature_arrays(features), score_vars)
+    listed = dict((name, (points.tolist(), listed.tolist())) for name, (points, listed) in terms.iteritems())
+
+    results = []
+    for i, score in enumerate(scores.tolist()):
+        score_data = {}
+        for name, (points, is_listed) in listed.iteritems():
+            if is_listed[i]:
+                score_data[name] = get_number(points[i])
+        results.append({ 'score': get_number(score), 'score_data': score_data })
+    return results
+
+
+def score_issues(bundles, org_members=None, contributor_index=None, score_vars=cvar, now=None, cache_documents=False):
+    """
+    Scores many issues of a repo together, sharing the org members and the
+    repo's contributor index rather than resolving them for each issue, with
+    the rules applied to the whole batch at once.
+    @param bundles: list of dicts with each issue's 'issue' and 'issue_comments'
+    @param now: the time the age rules are measured at, the time they run when None
+    @return: list of each issue's ScoreCalculator.to_dict(), or None when it
+             couldn't be scored
+    """
+    return [result for result, features in score_issues_with_features(bundles, org_members, contributor_index, score_vars, now, cache_documents)]
+
+
+def score_issues_with_features(bundles, org_members=None, contributor_index=None, score_vars=cvar, now=None, cache_documents=False):
+    """
+    @return: list of each issue's (ScoreCalculator.to_dict(), get_features()),
+             or (None, None) when it couldn't be scored
+    """
+    org_members = frozenset(org_members or [])
+    if contributor_index is None:
+        contributor_index = {}
+
+    scored = []
+    for bundle in bundles:
+        data = dict(bundle)
+        data.setdefault('org_members', org_members)
+        data.setdefault('contributor_index', contributor_index)
+
+        number = (data.get('issue') or {}).get('number')
+        try:
+            c = issue_score_calculator.ScoreCalculator(number=number, data=data, cache_documents=cache_documents, now=now)
+            scored.append((c, c.get_features()))
+        except Exception as ex:
+            print 'vector score_issues error, issue %s: %s' % (number, ex)
+            scored.append(None)
+
+    features = [item[1] for item in scored if item]
+    combined = iter(score_features(features, score_vars))
+
+    results = []
+    for item in scored:
+        if item is None:
+            results.append((None, None))
+            continue
+
+        c, f = item
+        result = next(combined)
+        c.score = result['score']
+        c.score_data = result['score_data']
+        c.references = f['issue_references']
+        try:
+            results.append((c.to_dict(), f))
+        except Exception as ex:
+            print 'vector score_issues error, issue %s: %s' % (c.number, ex)
+            results.append((None, None))
+    return results
+
+
+def save_issue_features(repo_username, repo_id, features):
+    """
+    Keeps the features of the repo's issues in one redis hash, so the repo
+    can be ranked again under other SCORE_VARS without any GitHub calls.
+    Features of issues are dropped when they're closed, and those of issues
+    closed without a webhook by the full issue sync.
+    """
+    mapping = dict((number, json.dumps(issue_features)) for number, issue_features in features.iteritems())
+    util.update_cached_hash(get_features_cache_key(repo_username, repo_id), mapping, 60*60*24*7)
+
+
+def get_issue_features(repo_username, repo_id):
+    """
+    @return: dict of issue number to its stored features, or None when
+             none are stored
+    """
+    mapping = util.get_cached_hash(get_features_cache_key(repo_username, repo_id))
+    if mapping is None:
+        return None
+    return dict((int(number), json.loads(issue_features)) for number, issue_features in mapping.iteritems())
+
+
+def remove_issue_features(repo_username, repo_id, numbers):
+    return util.remove_cached_hash_fields(get_features_cache_key(repo_username, repo_id), numbers)
+
+
+def remove_issue_features_except(repo_username, repo_id, numbers):
+    return util.remove_cached_hash_fields_except(get_features_cache_key(repo_username, repo_id), numbers)
+
+
+def get_number(value):
+    if value == int(value):
+        return int(value)
+    return value
+
+
+def get_features_cache_key(repo_username, repo_id):
+    return '%s:%s:features' % (repo_username, repo_id)
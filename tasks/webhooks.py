@@ -1,8 +1,8 @@
 import github_issue_submit
 import maintenance
-import models
+import issue_scores
 import github_api
-from main import db
+import projections
 from config.config import CONFIG_VARS as cvar
 
 
@@ -47,6 +47,8 @@ def receive_webhook(event_type, data):
 
         response['number'] = number
 
+        issue = projections.slim_issue(issue)
+
         repository = data.get('repository')
         if not repository:
             print 'receive_webhook, missing repository'
@@ -85,10 +87,7 @@ def receive_webhook(event_type, data):
             response['flagged_if_submitted_through_github'] = github_issue_submit.flag_if_submitted_through_github(repo_username, repo_id, issue)
 
         elif event_type == 'issues' and action == 'closed':
-            existing = models.get_issue(repo_username, repo_id, number)
-            if existing:
-                db.session.delete(existing)
-                db.session.commit()
+            issue_scores.remove_issue_score(repo_username, repo_id, number)
             github_issue_submit.remove_flag_when_closed(repo_username, repo_id, issue)
             response['closed'] = True
             return response
@@ -0,0 +1,134 @@
+"""
+Ranks a repo's open issues again under other SCORE_VARS, from the features
+stored when the issues were scored, aged as of now, entirely in memory and
+without calling GitHub. The ranking is compared to the live one, which is
+the same features ranked under the current SCORE_VARS.
+
+    python -m tasks.what_if driftyco ionic IMAGE=50 LINK=0
+    python -m tasks.what_if driftyco ionic CREATION_DECAY_EXP=1.3 --top 50
+"""
+import argparse
+import json
+import time
+import numpy as np
+from config.config import CONFIG_VARS as cvar
+from config.score import SCORE_VARS
+from tasks import vector_scores
+
+
+def simulate(repo_username, repo_id, overrides):
+    """
+    @param overrides: dict of SCORE_VARS names to their alternate values
+    @return: dict of each issue's new and live score and rank, ordered by the
+             new rank, or an error dict
+    """
+    start = time.time()
+    try:
+        score_vars, error = get_score_vars(overrides)
+        if error:
+            return { 'error': error }
+
+        features = vector_scores.get_issue_features(repo_username, repo_id)
+        if not features:
+            return { 'error': 'No stored issue features: %s/%s' % (repo_username, repo_id) }
+
+        numbers = sorted(features)
+        features = vector_scores.set_days_since([features[number] for number in numbers])
+        data = compare_rankings(numbers, features, score_vars)
+        data['repo_username'] = repo_username
+        data['repo_id'] = repo_id
+        data['score_vars'] = overrides
+        data['seconds'] = time.time() - start
+        return data
+
+    except Exception as ex:
+        print 'what_if simulate error: %s' % ex
+        return { 'error': '%s' % ex }
+
+
+def get_score_vars(overrides):
+    """
+    Only numeric SCORE_VARS can be changed, the others (like DEMO_DOMAINS)
+    are applied when the features are extracted.
+    @return: tuple of the SCORE_VARS with the overrides, and an error message
+    """
+    for name, value in (overrides or {}).iteritems():
+        if name not in SCORE_VARS:
+            return None, 'Unknown score var: %s' % name
+        if isinstance(value, bool) or not isinstance(value, (int, long, float)) or not isinstance(SCORE_VARS[name], (int, long, float)):
+            return None, 'Only numeric score vars can be simulated: %s' % name
+    return dict(cvar, **(overrides or {})), None
+
+
+def compare_rankings(numbers, features, score_vars, live_score_vars=cvar):
+    arrays = vector_scores.get_feature_arrays(features)
+    live_scores = vector_scores.combine(arrays, live_score_vars)[0]
+    scores = vector_scores.combine(arrays, score_vars)[0]
+
+    numbers = np.array(numbers)
+    live_ranks = get_ranks(live_scores, numbers)
+    ranks = get_ranks(scores, numbers)
+
+    order = np.argsort(ranks).tolist()
+    numbers, scores, ranks, live_scores, live_ranks = numbers.tolist(), scores.tolist(), ranks.tolist(), live_scores.tolist(), live_ranks.tolist()
+
+    issues = []
+    for i in order:
+        issues.append({
+            'number': numbers[i],
+            'score': vector_scores.get_number(scores[i]),
+            'rank': ranks[i],
+            'live_score': vector_scores.get_number(live_scores[i]),
+            'live_rank': live_ranks[i],
+            'rank_change': live_ranks[i] - ranks[i],
+        })
+
+    return {
+        'issues': issues,
+        'changed': sum(1 for issue in issues if issue['rank_change']),
+    }
+
+
+def get_ranks(scores, numbers):
+    """
+    @return: array of each issue's rank, 1 being the highest score, with
+             equal scores ranked by issue number
+    """
+    order = np.lexsort((numbers, -scores))
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[order] = np.arange(1, len(scores) + 1)
+    return ranks
+
+
+def parse_overrides(pairs):
+    """
+    @param pairs: list of 'NAME=VALUE' strings
+    """
+    overrides = {}
+    for pair in pairs:
+        name, _, value = pair.partition('=')
+        overrides[name.strip()] = json.loads(value)
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rank open issues under other score vars, from their stored features.')
+    parser.add_argument('repo_username')
+    parser.add_argument('repo_id')
+    parser.add_argument('score_vars', nargs='*', metavar='NAME=VALUE', help='alternate SCORE_VARS values')
+    parser.add_argument('--top', type=int, default=25, help='number of issues to list')
+    args = parser.parse_args(argv)
+
+    data = simulate(args.repo_username, args.repo_id, parse_overrides(args.score_vars))
+    if data.get('error'):
+        print data['error']
+        return
+
+    print '%s/%s, %s issues, %s ranked differently, %.3f seconds' % (args.repo_username, args.repo_id, len(data['issues']), data['changed'], data['seconds'])
+    print '%6s %8s %8s %10s %10s %8s' % ('rank', 'number', 'score', 'live rank', 'live score', 'change')
+    for issue in data['issues'][:args.top]:
+        print '%6s %8s %8s %10s %10s %+8d' % (issue['rank'], issue['number'], issue['score'], issue['live_rank'], issue['live_score'], issue['rank_change'])
+
+
+if __name__ == '__main__':
+    main()
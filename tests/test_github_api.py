@@ -0,0 +1,155 @@
+# python -m unittest discover
+
+import threading
+import time
+import unittest
+import github_api
+import util
+
+
+class TestGithubApi(unittest.TestCase):
+
+    def test_get_page_urls(self):
+        urls = github_api.get_page_urls('https://api.github.com/repositories/1/issues?per_page=100&page=4')
+        self.assertEquals(urls, [
+            'https://api.github.com/repositories/1/issues?per_page=100&page=2',
+            'https://api.github.com/repositories/1/issues?per_page=100&page=3',
+            'https://api.github.com/repositories/1/issues?per_page=100&page=4',
+        ])
+
+        urls = github_api.get_page_urls('https://api.github.com/orgs/driftyco/members?page=2')
+        self.assertEquals(urls, ['https://api.github.com/orgs/driftyco/members?page=2'])
+
+        self.assertEquals(github_api.get_page_urls('https://api.github.com/orgs/driftyco/members?per_page=100'), [])
+        self.assertEquals(github_api.get_page_urls(None), [])
+
+    def test_download_follows_next_without_page_numbers(self):
+        pages = {
+            'https://api.github.com/issues': ([1], { 'next': 'https://api.github.com/issues?after=a', 'last': 'https://api.github.com/issues?before=z' }),
+            'https://api.github.com/issues?after=a': ([2], { 'next': 'https://api.github.com/issues?after=b', 'last': 'https://api.github.com/issues?before=z' }),
+            'https://api.github.com/issues?after=b': ([3], {}),
+        }
+        fetch_page = github_api.fetch_page
+        github_api.fetch_page = lambda url, projection=None, expires=0: pages[url]
+        try:
+            data = github_api.download('issues', 'https://api.github.com/issues', 0)
+        finally:
+            github_api.fetch_page = fetch_page
+        self.assertEquals(data, [1, 2, 3])
+
+    def test_fetch_org_members_logins_error_not_kept(self):
+        fetch, get_cached_data = github_api.fetch, util.get_cached_data
+        github_api._org_members.pop('erroring-org', None)
+
+        def failing_fetch(path, expires):
+            raise ValueError('connection reset')
+
+        github_api.fetch = failing_fetch
+        util.get_cached_data = lambda key: None
+        try:
+            self.assertEquals(github_api.fetch_org_members_logins('erroring-org'), frozenset())
+            self.assertEquals(github_api.get_local_org_members('erroring-org'), None)
+        finally:
+            github_api.fetch, util.get_cached_data = fetch, get_cached_data
+
+    def test_get_validator_expires(self):
+        self.assertEquals(github_api.get_validator_expires(0, validator_expires=1000, max_overlap=60), 1000)
+        self.assertEquals(github_api.get_validator_expires(60, validator_expires=1000, max_overlap=60), 1000)
+        self.assertEquals(github_api.get_validator_expires(600, validator_expires=1000, max_overlap=60), 600)
+
+    def test_single_flight_shares_one_download(self):
+        url = 'https://api.github.com/test/shared'
+        release = threading.Event()
+        downloads = []
+        results = [None] * 3
+
+        def download():
+            downloads.append(url)
+            release.wait(5)
+            return [{ 'number': 1 }]
+
+        def call(i):
+            results[i] = github_api.single_flight(url, download, timeout=5)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(3)]
+        threads[0].start()
+        wait_until(lambda: url in github_api._flights)
+        for thread in threads[1:]:
+            thread.start()
+        wait_until(lambda: github_api._flights[url].followers == 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEquals(len(downloads), 1)
+        self.assertEquals(results, [[{ 'number': 1 }]] * 3)
+        self.assertEquals(len(set(id(result) for result in results)), 3)
+        self.assertEquals(len(set(id(result[0]) for result in results)), 3)
+        self.assertFalse(url in github_api._flights)
+
+    def test_single_flight_followers_fall_back(self):
+        url = 'https://api.github.com/test/failed'
+        release = threading.Event()
+        leader_errors = []
+        follower_results = []
+
+        def failing_download():
+            release.wait(5)
+            raise ValueError('connection reset')
+
+        def lead():
+            try:
+                github_api.single_flight(url, failing_download, timeout=5)
+            except ValueError as ex:
+                leader_errors.append(ex)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        wait_until(lambda: url in github_api._flights)
+
+        # a follower that gives up waiting downloads itself
+        self.assertEquals(github_api.single_flight(url, lambda: ['own'], timeout=0.01), ['own'])
+
+        # so does one whose leader failed
+        follower = threading.Thread(target=lambda: follower_results.append(github_api.single_flight(url, lambda: ['retried'], timeout=5)))
+        follower.start()
+        wait_until(lambda: github_api._flights[url].followers == 2)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEquals(len(leader_errors), 1)
+        self.assertEquals(follower_results, [['retried']])
+
+    def test_single_flight_releases_lock_after_error(self):
+        url = 'https://api.github.com/test/lock'
+        released = []
+        originals = (github_api.acquire_fetch_lock, github_api.release_fetch_lock)
+        github_api.acquire_fetch_lock = lambda url, timeout: 'token'
+        github_api.release_fetch_lock = lambda url, token: released.append((url, token))
+
+        def failing_download():
+            raise ValueError('connection reset')
+
+        try:
+            self.assertRaises(ValueError, github_api.single_flight, url, failing_download, wait_for_cache=True)
+            self.assertEquals(released, [(url, 'token')])
+            self.assertFalse(url in github_api._flights)
+
+            self.assertEquals(github_api.single_flight(url, lambda: ['data'], wait_for_cache=True), ['data'])
+            self.assertEquals(len(released), 2)
+        finally:
+            github_api.acquire_fetch_lock, github_api.release_fetch_lock = originals
+
+    def test_is_error(self):
+        self.assertEquals(github_api.is_error({ 'error': 'no content' }), True)
+        self.assertEquals(github_api.is_error({ 'number': 1 }), False)
+        self.assertEquals(github_api.is_error([{ 'error': 'not a dict' }]), False)
+
+
+def wait_until(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise AssertionError('timed out waiting')
+        time.sleep(0.001)
@@ -0,0 +1,33 @@
+# python -m unittest discover
+
+import unittest
+import link_classifier
+from link_classifier import LinkClassifier
+
+
+class TestLinkClassifier(unittest.TestCase):
+
+    def test_classify(self):
+        classifier = LinkClassifier(demo_domains=('codepen', 'plnkr'), forum_url='forum.ionicframework.com')
+
+        self.assertEquals(classifier.classify('http://i.imgur.com/abc.GIF?raw=1#top'), { 'image': True, 'video': False, 'code_demo': False, 'forum_link': False })
+        self.assertEquals(classifier.classify('https://example.com/videos/1/intro.mp4'), { 'image': False, 'video': True, 'code_demo': False, 'forum_link': False })
+        self.assertEquals(classifier.classify('http://codepen.io/abc/pen/xyz'), { 'image': False, 'video': False, 'code_demo': True, 'forum_link': False })
+        self.assertEquals(classifier.classify('http://forum.ionicframework.com/t/1/2'), { 'image': False, 'video': False, 'code_demo': False, 'forum_link': True })
+        self.assertEquals(classifier.classify('http://plnkr.co/screenshot.png')['image'], True)
+        self.assertEquals(classifier.classify('http://plnkr.co/screenshot.png')['code_demo'], True)
+        self.assertEquals(classifier.classify('http://github.com/driftyco/ionic'), dict.fromkeys(link_classifier.CATEGORIES, False))
+        self.assertEquals(classifier.classify(''), dict.fromkeys(link_classifier.CATEGORIES, False))
+
+        self.assertEquals(LinkClassifier(demo_domains=()).classify('http://codepen.io/abc')['code_demo'], False)
+        self.assertEquals(LinkClassifier(demo_domains=('a.b',)).classify('http://axb.com')['code_demo'], False)
+
+    def test_get_extension(self):
+        self.assertEquals(link_classifier.get_extension(' http://x.com/A.JPEG?w=1 '), 'jpeg')
+        self.assertEquals(link_classifier.get_extension('http://x.com/a.png#b.c'), 'png')
+        self.assertEquals(link_classifier.get_extension('nodot'), None)
+        self.assertEquals(link_classifier.get_extension(None), None)
+
+    def test_get_link_classifier(self):
+        self.assertTrue(link_classifier.get_link_classifier(('jsbin',)) is link_classifier.get_link_classifier(('jsbin',)))
+        self.assertTrue(link_classifier.get_link_classifier(('jsbin',)).classify('http://jsbin.com/a')['code_demo'])
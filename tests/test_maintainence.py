@@ -18,3 +18,32 @@ class TestMaintainance(unittest.TestCase):
         now = datetime(2000, 1, 1, 0, 0, 59)
         r = m.should_run_daily_maintenance(min_refresh_seconds=60, last_update_str='2000-01-01 00:00:00', now=now)
         self.assertEquals(r, False)
+
+
+    def test_needs_full_sync(self):
+        now = datetime(2000, 1, 10, 0, 0, 0)
+        self.assertEquals(m.needs_full_sync(None, now, full_sync_after=7), True)
+        self.assertEquals(m.needs_full_sync(datetime(2000, 1, 5, 0, 0, 0), now, full_sync_after=7), False)
+        self.assertEquals(m.needs_full_sync(datetime(2000, 1, 2, 0, 0, 0), now, full_sync_after=7), True)
+
+    def test_sync_repo_issues_reads_listing_before_maintenance(self):
+        events = []
+
+        def fetch_open_issues(repo_username, repo_id, since=None, labels=None):
+            numbers = [1, 2, 3] if since else [2, 4]
+            events.extend('fetched %s' % number for number in numbers)
+            return [{ 'number': number } for number in numbers]
+
+        originals = (m.github_api.fetch_open_issues, m.issue_maintenance, m.util.get_cached_value, m.util.set_cached_value)
+        m.github_api.fetch_open_issues = fetch_open_issues
+        m.issue_maintenance = lambda repo_username, repo_id, issue: events.append('maintained %s' % issue['number'])
+        m.util.get_cached_value = lambda cache_key: '2000-01-09T00:00:00Z'
+        m.util.set_cached_value = lambda cache_key, value, expires=None: None
+        try:
+            count = m.sync_repo_issues('driftyco', 'ionic', now=datetime(2000, 1, 10, 0, 0, 0))
+        finally:
+            m.github_api.fetch_open_issues, m.issue_maintenance, m.util.get_cached_value, m.util.set_cached_value = originals
+
+        self.assertEquals(count, 4)
+        self.assertEquals(events, ['fetched 1', 'fetched 2', 'fetched 3', 'fetched 2', 'fetched 4',
+                                   'maintained 1', 'maintained 2', 'maintained 3', 'maintained 4'])
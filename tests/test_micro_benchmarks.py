@@ -0,0 +1,54 @@
+# python -m unittest discover
+
+import unittest
+from benchmarks import micro
+
+
+class TestMicroBenchmarks(unittest.TestCase):
+
+    def test_load_corpus(self):
+        corpus = micro.load_corpus()
+        for group in ('bodies', 'comments', 'adversarial'):
+            self.assertTrue(corpus[group])
+            for name, text in corpus[group]:
+                self.assertTrue(isinstance(text, unicode))
+
+    def test_cases_run(self):
+        cases = micro.get_cases(micro.load_corpus())
+        for name, fn in cases.iteritems():
+            self.assertTrue(fn(), name)
+
+    def test_baseline_covers_every_case(self):
+        baseline = micro.load_baseline()
+        cases = micro.get_cases(micro.load_corpus())
+        self.assertEquals(sorted(baseline['cases']), sorted(cases))
+
+    def test_compare(self):
+        baseline = {
+            'allocation_method': 'tracemalloc',
+            'cases': {
+                'a': { 'relative_speed': 2.0, 'allocations': 100 },
+                'b': { 'relative_speed': 1.0, 'allocations': 10 },
+            }
+        }
+        results = {
+            'allocation_method': 'tracemalloc',
+            'cases': {
+                'a': { 'relative_speed': 1.5, 'allocations': 100 },
+                'b': { 'relative_speed': 1.0, 'allocations': 20 },
+                'c': { 'relative_speed': 0.1, 'allocations': 1000 },
+            }
+        }
+        self.assertEquals(micro.compare(results, baseline, threshold=0.3), [])
+
+        regressions = micro.compare(results, baseline, threshold=0.2)
+        self.assertEquals(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('a: 25.0% slower'))
+
+        results['cases']['a']['allocations'] = 200
+        self.assertEquals(len(micro.compare(results, baseline, threshold=0.3)), 1)
+
+        results['allocation_method'] = None
+        results['cases']['a']['allocations'] = None
+        self.assertEquals(micro.compare(results, baseline, threshold=0.3), [])
+
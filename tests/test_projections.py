@@ -0,0 +1,51 @@
+# python -m unittest discover
+
+import unittest
+import projections
+from benchmarks import payloads
+
+
+class TestProjections(unittest.TestCase):
+
+    def test_slim_issue(self):
+        issue = payloads.open_issues(1)[0]
+        issue['milestone'] = { 'number': 3, 'title': 'beta.14', 'url': 'https://api.github.com/repos/driftyco/ionic/milestones/3', 'open_issues': 4 }
+        issue['pull_request'] = { 'html_url': 'https://github.com/driftyco/ionic/pull/1', 'diff_url': 'https://github.com/driftyco/ionic/pull/1.diff' }
+
+        record = projections.slim_issue(issue)
+        self.assertEquals(record['number'], issue['number'])
+        self.assertEquals(record['body'], issue['body'])
+        self.assertEquals(record['user']['login'], issue['user']['login'])
+        self.assertEquals(record['user'].get('followers_url'), None)
+        self.assertEquals([l['name'] for l in record['labels']], [l['name'] for l in issue['labels']])
+        self.assertEquals(record['milestone']['title'], 'beta.14')
+        self.assertEquals(record['pull_request'], { 'html_url': 'https://github.com/driftyco/ionic/pull/1' })
+        self.assertEquals(record.get('url'), None)
+
+        self.assertEquals(projections.slim_issue(record), record)
+
+        record = projections.slim_issue({ 'number': 1, 'assignee': None, 'milestone': None })
+        self.assertEquals(record['assignee'], None)
+        self.assertEquals(record['milestone'], None)
+        self.assertEquals(record['labels'], [])
+        self.assertEquals('pull_request' in record, False)
+
+
+    def test_slim_comment_and_event(self):
+        comment = payloads.issue_comments(1)[0]
+        record = projections.slim_comment(comment)
+        self.assertEquals(record['id'], comment['id'])
+        self.assertEquals(record['body'], comment['body'])
+        self.assertEquals(record['user']['login'], comment['user']['login'])
+        self.assertEquals(projections.slim_comment(record), record)
+
+        event = payloads.issue_events(1)[0]
+        record = projections.slim_event(event)
+        self.assertEquals(record['event'], event['event'])
+        self.assertEquals(record['label']['name'], event['label']['name'])
+        self.assertEquals(projections.slim_event(record), record)
+
+
+    def test_project(self):
+        self.assertEquals(projections.project([{ 'id': 1 }], projections.slim_comment)[0]['id'], 1)
+        self.assertEquals(projections.project({ 'error': 'no content' }, projections.slim_issue), { 'error': 'no content' })
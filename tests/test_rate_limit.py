@@ -0,0 +1,146 @@
+# python -m unittest discover
+
+import time
+import unittest
+import util
+import rate_limit
+from config.config import CONFIG_VARS as cvar
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeRedis()
+        self.get_cache_db = util.get_cache_db
+        util.get_cache_db = lambda: self.db
+
+    def tearDown(self):
+        util.get_cache_db = self.get_cache_db
+
+    def test_record_response(self):
+        rate_limit.record_response(FakeResponse(200, limit=5000, remaining=100, reset=2000), now=1000)
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY], { 'limit': '5000', 'remaining': '100', 'reset': '2000' })
+        self.assertEquals(self.db.expire_at[rate_limit.RATE_LIMIT_KEY], 2060)
+
+        # a response sent before other processes spent calls doesn't raise the count
+        rate_limit.record_response(FakeResponse(200, limit=5000, remaining=120, reset=2000), now=1001)
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY]['remaining'], '100')
+        rate_limit.record_response(FakeResponse(200, limit=5000, remaining=90, reset=2000), now=1002)
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY]['remaining'], '90')
+
+        # a new window replaces the count
+        rate_limit.record_response(FakeResponse(200, limit=5000, remaining=4999, reset=5600), now=2001)
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY], { 'limit': '5000', 'remaining': '4999', 'reset': '5600' })
+        self.assertEquals(self.db.expire_at[rate_limit.RATE_LIMIT_KEY], 5660)
+
+    def test_reserve_call(self):
+        # nothing known about the budget yet
+        self.assertEquals(rate_limit.reserve_call(now=1000), 0)
+
+        rate_limit.record_response(FakeResponse(200, limit=5000, remaining=4000, reset=2000), now=1000)
+        self.assertEquals(rate_limit.reserve_call(now=1000), 0)
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY]['remaining'], '3999')
+
+        reserve = cvar['GITHUB_RATE_LIMIT_RESERVE']
+        rate_limit.record_response(FakeResponse(200, limit=5000, remaining=reserve + 1, reset=2000), now=1400)
+        self.assertEquals(rate_limit.reserve_call(now=1400), 600)
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY]['remaining'], str(reserve))
+
+        rate_limit.refund_call()
+        self.assertEquals(self.db.hashes[rate_limit.RATE_LIMIT_KEY]['remaining'], str(reserve + 1))
+
+    def test_wait_for_budget(self):
+        slept = []
+        sleep = time.sleep
+        time.sleep = slept.append
+        try:
+            self.assertEquals(rate_limit.wait_for_budget(), 0)
+
+            now = time.time()
+            rate_limit.record_response(FakeResponse(200, limit=5000, remaining=cvar['GITHUB_RATE_LIMIT_RESERVE'], reset=int(now) + 3600), now=now)
+            self.assertEquals(rate_limit.wait_for_budget(max_wait=60), 60)
+
+            self.db.hashes.clear()
+            self.assertTrue(rate_limit.record_response(FakeResponse(403, retry_after=30), now=time.time()))
+            wait = rate_limit.wait_for_budget(max_wait=60)
+            self.assertTrue(29 < wait < 31)
+        finally:
+            time.sleep = sleep
+        self.assertEquals(slept[0], 60)
+        self.assertEquals(len(slept), 2)
+
+
+    def test_get_wait_seconds(self):
+        # plenty of budget left
+        w = rate_limit.get_wait_seconds(remaining=4000, limit=5000, reset=1600, now=1000, reserve=50, low=0.2)
+        self.assertEquals(w, 0)
+
+        # below the low water mark, spread what's left over the window
+        w = rate_limit.get_wait_seconds(remaining=650, limit=5000, reset=1600, now=1000, reserve=50, low=0.2)
+        self.assertEquals(w, 1.0)
+
+        # only the reserve left, wait for the reset
+        w = rate_limit.get_wait_seconds(remaining=50, limit=5000, reset=1600, now=1000, reserve=50, low=0.2)
+        self.assertEquals(w, 600)
+
+        # window already reset
+        w = rate_limit.get_wait_seconds(remaining=0, limit=5000, reset=900, now=1000, reserve=50, low=0.2)
+        self.assertEquals(w, 0)
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, limit=None, remaining=None, reset=None, retry_after=None):
+        self.status_code = status_code
+        self.headers = {}
+        for name, value in (('X-RateLimit-Limit', limit), ('X-RateLimit-Remaining', remaining), ('X-RateLimit-Reset', reset), ('Retry-After', retry_after)):
+            if value is not None:
+                self.headers[name] = str(value)
+
+
+class FakeRedis(object):
+    """
+    The few commands the rate limit uses, with RECORD_SCRIPT run as the
+    same steps in Python.
+    """
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.expire_at = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, value, seconds):
+        self.values[key] = str(value)
+
+    def exists(self, key):
+        return key in self.values or key in self.hashes
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = str(value)
+
+    def hincrby(self, key, field, amount):
+        value = int(self.hget(key, field) or 0) + amount
+        self.hset(key, field, value)
+        return value
+
+    def register_script(self, script):
+        assert script == rate_limit.RECORD_SCRIPT
+        return self.record
+
+    def record(self, keys, args):
+        key = keys[0]
+        limit, remaining, reset = args
+        if int(reset) > int(self.hget(key, 'reset') or 0):
+            self.hashes[key] = { 'limit': str(limit), 'remaining': str(remaining), 'reset': str(reset) }
+        else:
+            if int(remaining) < int(self.hget(key, 'remaining') or remaining):
+                self.hset(key, 'remaining', remaining)
+            self.hset(key, 'limit', limit)
+        self.expire_at[key] = int(reset) + 60
@@ -0,0 +1,73 @@
+# python -m unittest discover
+
+import unittest
+import util
+import github_api
+from tasks import rescore, vector_scores
+
+
+class TestRescore(unittest.TestCase):
+
+    def setUp(self):
+        self.originals = [
+            (github_api, 'fetch_cached', github_api.fetch_cached),
+            (github_api, 'fetch_cached_many', github_api.fetch_cached_many),
+            (github_api, 'refresh_repo_contributors', github_api.refresh_repo_contributors),
+            (github_api, 'get_repo_contributor_index', github_api.get_repo_contributor_index),
+            (vector_scores, 'get_issue_features', vector_scores.get_issue_features),
+            (util, 'get_cached_hash', util.get_cached_hash),
+            (rescore, 'get_db_numbers', rescore.get_db_numbers),
+        ]
+
+    def tearDown(self):
+        for module, name, fn in self.originals:
+            setattr(module, name, fn)
+
+    def test_get_cached_bundles_skips_issues_no_longer_scored(self):
+        issues = [{ 'number': 1, 'comments': 0 }, { 'number': 2, 'comments': 1 }, { 'number': 3, 'comments': 0, 'closed_at': '2016-01-01T00:00:00Z' }, { 'number': 4, 'comments': 0 }]
+        github_api.fetch_cached = lambda path: issues
+        github_api.fetch_cached_many = lambda paths: [[{ 'body': path }] for path in paths]
+        vector_scores.get_issue_features = lambda repo_username, repo_id: { 2: {}, 3: {} }
+        rescore.get_db_numbers = lambda repo_username, repo_id, numbers: [number for number in numbers if number == 4]
+
+        bundles = rescore.get_cached_bundles('driftyco', 'ionic')
+        self.assertEquals([bundle['issue']['number'] for bundle in bundles], [2, 4])
+        self.assertEquals(bundles[0]['issue_comments'], [{ 'body': '/repos/driftyco/ionic/issues/2/comments' }])
+
+    def test_get_cached_bundles_skips_issues_scored_from_a_newer_copy(self):
+        issues = [
+            { 'number': 1, 'comments': 0, 'updated_at': '2016-01-02T00:00:00Z' },
+            { 'number': 2, 'comments': 0, 'updated_at': '2016-01-01T00:00:00Z' },
+            { 'number': 3, 'comments': 0, 'updated_at': '2016-01-01T00:00:00Z' },
+        ]
+        github_api.fetch_cached = lambda path: issues
+        github_api.fetch_cached_many = lambda paths: [[] for path in paths]
+        vector_scores.get_issue_features = lambda repo_username, repo_id: {
+            1: { 'updated_at': '2016-01-02T00:00:00' },
+            2: { 'updated_at': '2016-01-03T00:00:00' },
+            3: { 'updated_at': None },
+        }
+        rescore.get_db_numbers = lambda repo_username, repo_id, numbers: []
+
+        bundles = rescore.get_cached_bundles('driftyco', 'ionic')
+        self.assertEquals([bundle['issue']['number'] for bundle in bundles], [1, 3])
+
+    def test_get_contributor_index_fetches_when_not_cached(self):
+        github_api.refresh_repo_contributors = lambda repo_username, repo_id: { 'fetched': 1 }
+        github_api.get_repo_contributor_index = lambda repo_username, repo_id: { 'cached': 1 }
+
+        util.get_cached_hash = lambda cache_key: None
+        self.assertEquals(rescore.get_contributor_index('driftyco', 'ionic'), { 'fetched': 1 })
+
+        util.get_cached_hash = lambda cache_key: { 'cached': '1' }
+        self.assertEquals(rescore.get_contributor_index('driftyco', 'ionic'), { 'cached': 1 })
+
+        util.get_cached_hash = lambda cache_key: None
+        github_api.refresh_repo_contributors = lambda repo_username, repo_id: None
+        self.assertEquals(rescore.get_contributor_index('driftyco', 'ionic'), None)
+
+    def test_get_chunks(self):
+        self.assertEquals(rescore.get_chunks(range(10), 4), [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]])
+        self.assertEquals(rescore.get_chunks(range(3), 8), [[0], [1], [2]])
+        self.assertEquals(rescore.get_chunks([], 4), [])
+        self.assertEquals(rescore.get_chunks(range(3), 0), [[0, 1, 2]])
@@ -1,8 +1,14 @@
+# -*- coding: utf-8 -*-
 # python -m unittest discover
 
+import json
 import unittest
+import util
 from datetime import datetime
-from tasks.issue_score_calculator import ScoreCalculator
+from config.config import CONFIG_VARS as cvar
+from tasks import issue_score_calculator
+from tasks.issue_score_calculator import ScoreCalculator, get_document_cache_key, count_code_lines
+from tasks.vector_scores import score_issues
 
 
 class TestScore(unittest.TestCase):
@@ -61,6 +67,17 @@ class TestScore(unittest.TestCase):
         scorer.each_contribution(add=2, max_contribution=100)
         self.assertEquals(scorer.score, 0)
 
+        scorer = ScoreCalculator(data={
+            'contributor_index': { 'user1': 10, 'user2': 10000 },
+            'issue': {
+                'user': {
+                    'login': 'user1'
+                }
+            }
+        })
+        scorer.each_contribution(add=2, max_contribution=100)
+        self.assertEquals(scorer.score, 20)
+
 
     def test_short_title_text(self):
         scorer = ScoreCalculator(data={
@@ -450,6 +467,119 @@ class TestScore(unittest.TestCase):
         scorer.issue_references(add=2)
         self.assertEquals(scorer.score, 0)
 
+    def test_rules_share_the_analysis(self):
+        scorer = ScoreCalculator(data=setup_data('''
+            Demo http://codepen.io/abc/pen/xyz and http://i.imgur.com/abc.gif #12
+        ''', issue_comments=[
+            { 'body': 'Same http://codepen.io/abc/pen/xyz and http://forum.ionicframework.com/t/1/2 #12 #13' }
+        ]))
+        scorer.code_demos(add=1)
+        scorer.images(add=10)
+        scorer.forum_links(add=100)
+        scorer.links(add=1000)
+        scorer.issue_references(add=10000)
+        self.assertEquals(scorer.score, 20111)
+        self.assertEquals(len(scorer.get_documents()), 2)
+
+
+
+    def test_score_issues(self):
+        bundles = [
+            { 'issue': { 'number': 1, 'title': 'a', 'body': 'b', 'user': { 'login': 'user1' }, 'created_at': '2015-01-01T00:00:00Z', 'updated_at': '2015-01-02T00:00:00Z' }, 'issue_comments': [] },
+            { 'issue': { 'number': 2, 'title': 'a', 'body': 'b', 'user': { 'login': 'member' }, 'created_at': '2015-01-01T00:00:00Z', 'updated_at': '2015-01-02T00:00:00Z' }, 'issue_comments': [] },
+            { 'issue': { 'number': 3, 'user': { 'login': 'user1' } }, 'issue_comments': [] },
+        ]
+        results = score_issues(bundles, org_members=['member'], contributor_index={ 'user1': 1 })
+        self.assertEquals([r['number'] for r in results[:2]], [1, 2])
+        self.assertEquals(results[0]['score_data'].get('each_contribution'), cvar['CONTRIBUTION'])
+        self.assertEquals(results[1]['score_data'].get('core_team_member'), cvar['CORE_TEAM'])
+        self.assertEquals(results[2], None)
+
+        for data, result in zip(bundles[:2], results):
+            data = dict(data, org_members=['member'], contributor_index={ 'user1': 1 })
+            c = ScoreCalculator(number=data['issue']['number'], data=data)
+            c.load_scores()
+            self.assertEquals(c.to_dict(), result)
+
+    def test_get_document_cache_keys(self):
+        scorer = ScoreCalculator(data=setup_data(u'body ☃', issue_comments=[
+            { 'id': 12, 'updated_at': '2015-01-01T00:00:00Z', 'body': 'a' },
+            { 'id': 12, 'updated_at': '2015-01-02T00:00:00Z', 'body': 'a' },
+            { 'body': 'b' },
+        ]))
+        keys = scorer.get_document_cache_keys()
+        self.assertEquals(len(keys), 4)
+        self.assertEquals(len(set(keys)), 4)
+        self.assertEquals(keys[0], get_document_cache_key(u'body ☃'))
+        self.assertEquals(keys[3], get_document_cache_key('b'))
+        self.assertTrue('12' in keys[1])
+
+        self.assertEquals(ScoreCalculator(data=setup_data('')).get_document_cache_keys(), [get_document_cache_key(None)])
+        self.assertNotEquals(get_document_cache_key('a'), get_document_cache_key('b'))
+
+    def test_score_issues_cache_documents_same_scores(self):
+        bundles = [{ 'issue': { 'number': 1, 'title': 'a', 'body': 'http://codepen.io/a #1', 'created_at': '2015-01-01T00:00:00Z', 'updated_at': '2015-01-02T00:00:00Z' }, 'issue_comments': [{ 'id': 1, 'updated_at': '2015-01-01T00:00:00Z', 'body': '    code' }] }]
+        now = datetime(2016, 1, 1)
+
+        cache = {}
+        hits = []
+        analyzed = []
+
+        def get_cached_data_many(cache_keys):
+            hits.extend(cache_key for cache_key in cache_keys if cache_key in cache)
+            return [json.loads(cache[cache_key]) if cache_key in cache else None for cache_key in cache_keys]
+
+        def set_cached_data_many(items, expires):
+            for cache_key, data in items:
+                cache[cache_key] = json.dumps(data)
+
+        def analyze_text(text):
+            analyzed.append(text)
+            return original_analyze_text(text)
+
+        originals = (util.get_cached_data_many, util.set_cached_data_many, issue_score_calculator.analyze_text)
+        original_analyze_text = issue_score_calculator.analyze_text
+        util.get_cached_data_many, util.set_cached_data_many, issue_score_calculator.analyze_text = get_cached_data_many, set_cached_data_many, analyze_text
+        try:
+            first = score_issues(bundles, cache_documents=True, now=now)
+            self.assertEquals(len(cache), 2)
+            self.assertEquals((hits, len(analyzed)), ([], 2))
+
+            second = score_issues(bundles, cache_documents=True, now=now)
+            self.assertEquals(len(hits), 2)
+            self.assertEquals(len(analyzed), 2)
+        finally:
+            util.get_cached_data_many, util.set_cached_data_many, issue_score_calculator.analyze_text = originals
+
+        self.assertEquals(first, second)
+        self.assertEquals(second, score_issues(bundles, now=now))
+
+    def test_count_code_lines(self):
+        self.assertEquals(count_code_lines('```line1\nline2\nline3```'), 3)
+        self.assertEquals(count_code_lines('```\ncode\n```\n    indented'), 4)
+        self.assertEquals(count_code_lines('    a\n    b\n  c'), 2)
+        self.assertEquals(count_code_lines('open ``` never closed\nline\nline'), 3)
+        self.assertEquals(count_code_lines('``````'), 1)
+        self.assertEquals(count_code_lines('````\n`'), 2)
+        self.assertEquals(count_code_lines(''), 0)
+        self.assertEquals(count_code_lines(None), 0)
+
+    def test_count_code_lines_max_chars(self):
+        text = '    a\n```b\nc\nd```' + '\n    e' * 10
+        self.assertEquals(count_code_lines(text), 14)
+        self.assertEquals(count_code_lines(text, max_chars=5), 1)
+        self.assertEquals(count_code_lines(text, max_chars=10), 2)
+        self.assertEquals(count_code_lines(text, max_chars=len(text) - 1), 14)
+        self.assertEquals(count_code_lines(text, max_chars=len(text) - 5), 13)
+
+        scan_max = cvar['SNIPPET_SCAN_MAX']
+        cache_key = get_document_cache_key(text)
+        cvar['SNIPPET_SCAN_MAX'] = 5
+        try:
+            self.assertEquals(count_code_lines(text), 1)
+            self.assertNotEquals(get_document_cache_key(text), cache_key)
+        finally:
+            cvar['SNIPPET_SCAN_MAX'] = scan_max
 
 
 
@@ -0,0 +1,82 @@
+# python -m unittest discover
+
+import time
+import unittest
+import util
+
+
+class TestUtil(unittest.TestCase):
+
+    def setUp(self):
+        self.template_sources = dict(util._template_sources)
+        self.compiled_templates = dict(util._compiled_templates)
+
+    def tearDown(self):
+        util._template_sources.clear()
+        util._template_sources.update(self.template_sources)
+        util._compiled_templates.clear()
+        util._compiled_templates.update(self.compiled_templates)
+
+    def test_local_cache(self):
+        cache = util.LocalCache(max_entries=2, max_bytes=10)
+        cache.set('a', '123', ttl=10, now=100)
+        self.assertEquals(cache.get('a', now=105), '123')
+        self.assertEquals(cache.get('a', now=111), None)
+
+        cache.set('a', '1', ttl=10, now=100)
+        cache.set('b', '2', ttl=10, now=100)
+        cache.get('a', now=100)
+        cache.set('c', '3', ttl=10, now=100)
+        # b was the least recently used
+        self.assertEquals(cache.get('b', now=100), None)
+        self.assertEquals(cache.get('a', now=100), '1')
+        self.assertEquals(cache.get('c', now=100), '3')
+
+        cache = util.LocalCache(max_entries=10, max_bytes=10)
+        cache.set('a', '123456', ttl=10, now=100)
+        cache.set('b', '123456', ttl=10, now=100)
+        self.assertEquals(cache.get('a', now=100), None)
+        self.assertEquals(cache.get_stats()['bytes'], 6)
+
+        cache.set('c', '12345678901', ttl=10, now=100)
+        self.assertEquals(cache.get('c', now=100), None)
+
+        cache.delete('b')
+        self.assertEquals(cache.get_stats()['entries'], 0)
+        self.assertEquals(cache.get_stats()['bytes'], 0)
+
+
+    def test_get_local_ttl(self):
+        ttls = [('*:members', 600), ('https://api.github.com/*', 60)]
+        self.assertEquals(util.get_local_ttl('driftyco:members', ttls), 600)
+        self.assertEquals(util.get_local_ttl('https://api.github.com/users/abe', ttls), 60)
+        self.assertEquals(util.get_local_ttl('template:CLOSING_TEMPLATE', ttls), 0)
+
+
+    def test_cached_data_codecs(self):
+        data = [{ 'number': 1, 'title': u'caf\xe9', 'body': 'x' * 2000, 'milestone': None, 'labels': [] }]
+
+        for codec in ('json', 'zlib', 'msgpack'):
+            value = util.encode_cached_data(data, codec=codec, min_bytes=1024)
+            self.assertEquals(util.decode_cached_data(value), data)
+
+        value = util.encode_cached_data(data, codec='zlib', min_bytes=1024)
+        self.assertEquals(value[0], util.ZLIB_JSON_HEADER)
+        self.assertEquals(len(value) < 1024, True)
+
+        # small values and entries written before compression are plain json
+        value = util.encode_cached_data(['abe', 'jeb'], codec='zlib', min_bytes=1024)
+        self.assertEquals(value, '["abe", "jeb"]')
+        self.assertEquals(util.decode_cached_data('{"score": 10}'), { 'score': 10 })
+
+
+    def test_get_template(self):
+        util._template_sources['TEST_TEMPLATE'] = ('Hi <%= user.login %>, #<%= issue.number %>', time.time())
+        self.assertEquals(util.get_template('TEST_TEMPLATE', { 'user': { 'login': 'abe' }, 'issue': { 'number': 1 } }), 'Hi abe, #1')
+
+        template = util.get_compiled_template('TEST_TEMPLATE')
+        self.assertEquals(util.get_compiled_template('TEST_TEMPLATE') is template, True)
+
+        util._template_sources['TEST_TEMPLATE'] = ('Bye <%= user.login %>', time.time())
+        self.assertEquals(util.get_compiled_template('TEST_TEMPLATE') is template, False)
+        self.assertEquals(util.get_template('TEST_TEMPLATE', { 'user': { 'login': 'abe' } }), 'Bye abe')
@@ -0,0 +1,93 @@
+# python -m unittest discover
+
+import unittest
+import numpy as np
+import util
+from datetime import datetime
+from config.config import CONFIG_VARS as cvar
+from tasks import vector_scores
+from tasks.issue_score_calculator import ScoreCalculator
+from benchmarks import payloads
+
+NOW = datetime(2016, 3, 1, 12, 0, 0)
+
+
+class TestVectorScores(unittest.TestCase):
+
+    def test_same_as_load_scores(self):
+        bundles = [{ 'issue': b['issue'], 'issue_comments': b['issue_comments'] } for b in payloads.score_bundles(30)]
+        bundles[0]['issue']['labels'] = [{ 'name': cvar['HIGH_PRIORITY_LABEL'] }, { 'name': cvar['NEEDS_REPLY_LABEL'] }]
+        bundles[1]['issue']['user'] = { 'login': 'member' }
+        bundles[2]['issue']['user'] = { 'login': 'contributor' }
+        bundles[3]['issue']['created_at'] = (NOW).strftime('%Y-%m-%dT%H:%M:%SZ')
+        bundles[3]['issue']['updated_at'] = (NOW).strftime('%Y-%m-%dT%H:%M:%SZ')
+        bundles[4]['issue']['title'] = 'short'
+        bundles[4]['issue']['body'] = 'http://codepen.io/a/pen/b'
+        bundles[5]['issue_comments'] = []
+
+        org_members = ['member', 'user1', 'user2']
+        contributor_index = { 'contributor': 3 }
+
+        results = vector_scores.score_issues(bundles, org_members, contributor_index, now=NOW)
+        for bundle, result in zip(bundles, results):
+            c = ScoreCalculator(number=bundle['issue']['number'], data=dict(bundle, org_members=org_members, contributor_index=contributor_index), now=NOW)
+            self.assertTrue(c.load_scores())
+            self.assertEquals(result, c.to_dict())
+
+        self.assertEquals(results[0]['score_data']['high_priority'], cvar['HIGH_PRIORITY'])
+        self.assertEquals(results[1]['score_data']['core_team_member'], cvar['CORE_TEAM'])
+        self.assertEquals(results[3]['score_data']['daily_decay_since_creation'], cvar['CREATED_START'])
+
+    def test_combine(self):
+        features = [
+            dict.fromkeys(vector_scores.FEATURES, 0),
+            dict(dict.fromkeys(vector_scores.FEATURES, 0), title_length=100, body_length=1000, days_since_creation=10, days_since_update=None, links=3),
+        ]
+        score_vars = dict(cvar, LINK=1, BODY_CHAR_ADD=1, BODY_CHAR_X=100, BODY_CHAR_MAX=5, CREATED_START=50, CREATION_DECAY_EXP=1.5)
+        results = vector_scores.score_features(features, score_vars)
+
+        self.assertEquals(results[0]['score_data'], { 'short_title_text': -score_vars['SHORT_TITLE_TEXT_SUBTRACT'], 'short_body_text': -score_vars['SHORT_BODY_TEXT_SUBTRACT'], 'daily_decay_since_creation': 50, 'daily_decay_since_last_update': score_vars['UPDATE_START'] })
+        self.assertEquals(results[1]['score_data'], { 'every_x_characters_in_body': 5, 'daily_decay_since_creation': 18, 'links': 3 })
+        self.assertEquals(results[1]['score'], 26)
+        self.assertEquals(vector_scores.score_features([]), [])
+
+    def test_apply_decay_same_as_rescoring(self):
+        bundles = [{ 'issue': b['issue'], 'issue_comments': b['issue_comments'] } for b in payloads.score_bundles(30)]
+        bundles[0]['issue']['created_at'] = (NOW).strftime('%Y-%m-%dT%H:%M:%SZ')
+        bundles[0]['issue']['updated_at'] = (NOW).strftime('%Y-%m-%dT%H:%M:%SZ')
+        later = datetime(2016, 9, 20, 6, 30, 0)
+
+        stored = vector_scores.score_issues(bundles, now=NOW)
+        expected = vector_scores.score_issues(bundles, now=later)
+        self.assertNotEquals(stored, expected)
+        self.assertEquals(vector_scores.apply_decay(stored, now=later), expected)
+        self.assertEquals(vector_scores.apply_decay([]), [])
+
+    def test_get_days_since(self):
+        now = datetime(2016, 3, 1, 12, 0, 0)
+        dates = ['2016-02-28T12:00:00', '2016-03-01T11:00:00', '2016-03-02T11:00:00', None, 'not a date']
+        days = vector_scores.get_days_since(dates, now)
+        for date, age in zip(dates[:3], days[:3]):
+            self.assertEquals(age, abs((now - datetime.strptime(date, '%Y-%m-%dT%H:%M:%S')).days))
+        self.assertTrue(np.isnan(days[3]))
+        self.assertTrue(np.isnan(days[4]))
+
+    def test_set_days_since(self):
+        features = [
+            { 'days_since_creation': 1, 'days_since_update': 1, 'created_at': '2016-01-01T00:00:00', 'updated_at': '2016-02-01T00:00:00' },
+            { 'days_since_creation': None, 'days_since_update': None, 'created_at': None, 'updated_at': None },
+        ]
+        vector_scores.set_days_since(features, datetime(2016, 3, 1, 12, 0, 0))
+        self.assertEquals(features[0]['days_since_creation'], 60)
+        self.assertEquals(features[0]['days_since_update'], 29)
+        self.assertEquals(features[1]['days_since_creation'], None)
+
+    def test_remove_issue_features(self):
+        removed = []
+        remove_cached_hash_fields = util.remove_cached_hash_fields
+        util.remove_cached_hash_fields = lambda cache_key, fields: removed.append((cache_key, fields))
+        try:
+            vector_scores.remove_issue_features('driftyco', 'ionic', [12])
+        finally:
+            util.remove_cached_hash_fields = remove_cached_hash_fields
+        self.assertEquals(removed, [(vector_scores.get_features_cache_key('driftyco', 'ionic'), [12])])
@@ -0,0 +1,51 @@
+# python -m unittest discover
+
+import unittest
+import numpy as np
+from config.config import CONFIG_VARS as cvar
+from tasks import what_if, vector_scores
+
+
+def features(**values):
+    f = dict.fromkeys(vector_scores.FEATURES, 0)
+    f.update(title_length=100, body_length=100, days_since_creation=365, days_since_update=365)
+    f.update(values)
+    return f
+
+
+class TestWhatIf(unittest.TestCase):
+
+    def test_compare_rankings(self):
+        numbers = [10, 11, 12]
+        data = what_if.compare_rankings(numbers, [features(images=1), features(links=4), features()], dict(cvar, IMAGE=100))
+
+        self.assertEquals([issue['number'] for issue in data['issues']], [10, 11, 12])
+        self.assertEquals(data['issues'][0]['score'] - data['issues'][2]['score'], 100)
+        self.assertEquals(data['issues'][0]['live_score'] - data['issues'][2]['live_score'], cvar['IMAGE'])
+        self.assertEquals(data['issues'][0]['live_rank'], 2)
+        self.assertEquals(data['issues'][0]['rank_change'], 1)
+        self.assertEquals(data['issues'][1]['live_rank'], 1)
+        self.assertEquals(data['issues'][1]['rank_change'], -1)
+        self.assertEquals(data['changed'], 2)
+
+        data = what_if.compare_rankings(numbers, [features(images=1), features(links=4), features()], cvar)
+        self.assertEquals(data['changed'], 0)
+
+    def test_get_ranks(self):
+        ranks = what_if.get_ranks(np.array([5.0, 20.0, 5.0, 1.0]), np.array([3, 1, 2, 4]))
+        self.assertEquals(ranks.tolist(), [3, 1, 2, 4])
+
+    def test_get_score_vars(self):
+        score_vars, error = what_if.get_score_vars({ 'IMAGE': 50, 'CREATION_DECAY_EXP': 1.5 })
+        self.assertEquals(error, None)
+        self.assertEquals(score_vars['IMAGE'], 50)
+        self.assertEquals(score_vars['LINK'], cvar['LINK'])
+
+        self.assertEquals(what_if.get_score_vars({ 'GITHUB_ACCESS_TOKEN': 1 })[0], None)
+        self.assertEquals(what_if.get_score_vars({ 'IMAGE': '50' })[0], None)
+        self.assertEquals(what_if.get_score_vars({ 'FORUM_URL': 1 })[0], None)
+        self.assertEquals(what_if.get_score_vars({ 'SNIPPET_SCAN_MAX': 10 })[0], None)
+        self.assertEquals(what_if.get_score_vars({})[1], None)
+
+    def test_parse_overrides(self):
+        self.assertEquals(what_if.parse_overrides(['IMAGE=50', 'CREATION_DECAY_EXP=1.3']), { 'IMAGE': 50, 'CREATION_DECAY_EXP': 1.3 })
@@ -1,27 +1,427 @@
 import os
 import json
+import hashlib
 import redis
 import requests
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from fnmatch import fnmatchcase
 from config.config import CONFIG_VARS as cvar
+from config.templates import TEMPLATE_VARS
 from datetime import datetime
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+INVALIDATE_CHANNEL = 'cache:invalidate'
+
+# Header byte of encoded cache values. Plain JSON values, which never start
+# with one of these, are stored without a header.
+ZLIB_JSON_HEADER = '\x01'
+ZLIB_MSGPACK_HEADER = '\x02'
+
 
 def get_cached_data(cache_key):
+    """
+    Reads through the in-process cache (for keys matching LOCAL_CACHE_TTLS)
+    before asking redis. Values are kept encoded so every caller gets its
+    own copy.
+    """
     try:
-        cached_data = get_cached_value(cache_key)
+        local_ttl = get_local_ttl(cache_key)
+
+        cached_data = None
+        if local_ttl > 0:
+            cached_data = local_cache.get(cache_key)
+
+        if cached_data is None:
+            cached_data = get_cached_value(cache_key)
+            count_redis_stat('hits' if cached_data is not None else 'misses')
+            if cached_data is not None:
+                set_local_cached_value(cache_key, cached_data, local_ttl)
+
         if cached_data is not None:
-            return json.loads(cached_data)
+            return decode_cached_data(cached_data)
     except Exception as ex:
         print 'get_cached_data, %s: %s' % (cache_key, ex)
 
 
 def set_cached_data(cache_key, data, expires=300):
     try:
-        set_cached_value(cache_key, json.dumps(data), expires)
+        value = encode_cached_data(data)
+        set_cached_value(cache_key, value, expires)
+
+        local_ttl = get_local_ttl(cache_key)
+        if local_ttl > 0:
+            set_local_cached_value(cache_key, value, min(expires, local_ttl))
+            publish_invalidation(cache_key)
     except Exception as ex:
         print 'set_cached_data, %s: %s' % (cache_key, ex)
 
 
+def encode_cached_data(data, codec=cvar['CACHE_CODEC'], min_bytes=cvar['CACHE_COMPRESS_MIN_BYTES']):
+    """
+    Values shorter than min_bytes as JSON are stored as plain JSON. Larger ones
+    are compressed with zlib, as JSON or, when the codec is 'msgpack' and it's
+    installed, as msgpack.
+    """
+    value = json.dumps(data)
+    if codec == 'json' or len(value) < min_bytes:
+        return value
+
+    if codec == 'msgpack' and msgpack is not None:
+        return ZLIB_MSGPACK_HEADER + zlib.compress(msgpack.packb(data, use_bin_type=True), cvar['CACHE_COMPRESS_LEVEL'])
+
+    return ZLIB_JSON_HEADER + zlib.compress(value, cvar['CACHE_COMPRESS_LEVEL'])
+
+
+def decode_cached_data(value):
+    header = value[:1]
+    if header == ZLIB_JSON_HEADER:
+        return json.loads(zlib.decompress(value[1:]))
+
+    if header == ZLIB_MSGPACK_HEADER:
+        return msgpack.unpackb(zlib.decompress(value[1:]), raw=False)
+
+    return json.loads(value)
+
+
+def get_cached_data_many(cache_keys):
+    """
+    Looks up many keys with a single MGET, after checking the in-process cache.
+    @return: list of each key's data, or None when it isn't cached
+    """
+    values = [None] * len(cache_keys)
+    try:
+        local_ttls = [get_local_ttl(cache_key) for cache_key in cache_keys]
+
+        missing = []
+        for i, cache_key in enumerate(cache_keys):
+            if local_ttls[i] > 0:
+                values[i] = local_cache.get(cache_key)
+            if values[i] is None:
+                missing.append(i)
+
+        if missing:
+            redis_values = get_cache_db().mget([cache_keys[i] for i in missing])
+            for i, value in zip(missing, redis_values):
+                count_redis_stat('hits' if value is not None else 'misses')
+                if value is not None:
+                    values[i] = value
+                    set_local_cached_value(cache_keys[i], value, local_ttls[i])
+
+    except Exception as ex:
+        print 'get_cached_data_many, %s keys: %s' % (len(cache_keys), ex)
+
+    data = []
+    for cache_key, value in zip(cache_keys, values):
+        try:
+            data.append(decode_cached_data(value) if value is not None else None)
+        except Exception as ex:
+            print 'get_cached_data_many, %s: %s' % (cache_key, ex)
+            data.append(None)
+    return data
+
+
+def set_cached_data_many(items, expires=300):
+    """
+    Writes many (cache_key, data) items with a single pipeline.
+    """
+    try:
+        pipe = get_cache_db().pipeline(transaction=False)
+        for cache_key, data in items:
+            value = encode_cached_data(data)
+            pipe.setex(cache_key, value, expires)
+
+            local_ttl = get_local_ttl(cache_key)
+            if local_ttl > 0:
+                set_local_cached_value(cache_key, value, min(expires, local_ttl))
+                pipe.publish(INVALIDATE_CHANNEL, '%s %s' % (get_process_id(), cache_key))
+        pipe.execute()
+    except Exception as ex:
+        print 'set_cached_data_many, %s' % ex
+
+
+class LocalCache(object):
+    """
+    Thread-safe LRU cache bounded by entry count and by the total length of
+    its values, with a TTL per entry.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = { 'hits': 0, 'misses': 0, 'evictions': 0 }
+
+    def get(self, key, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= now:
+                self.bytes -= len(value)
+                self.stats['misses'] += 1
+                return None
+
+            # re-insert as the most recently used
+            self.entries[key] = entry
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            self._remove(key)
+            if ttl <= 0 or len(value) > self.max_bytes:
+                return
+            self.entries[key] = (value, now + ttl)
+            self.bytes += len(value)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.bytes
+            return stats
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[0])
+
+
+local_cache = LocalCache(cvar['LOCAL_CACHE_MAX_ENTRIES'], cvar['LOCAL_CACHE_MAX_BYTES'])
+
+_redis_stats = { 'hits': 0, 'misses': 0 }
+_redis_stats_lock = threading.Lock()
+
+_process_id = None
+_process_pid = None
+_listener_lock = threading.Lock()
+
+
+def count_redis_stat(name):
+    with _redis_stats_lock:
+        _redis_stats[name] += 1
+
+
+def get_cache_stats():
+    with _redis_stats_lock:
+        redis_stats = dict(_redis_stats)
+    return {
+        'local': local_cache.get_stats(),
+        'redis': redis_stats,
+    }
+
+
+def get_local_ttl(cache_key, local_cache_ttls=cvar['LOCAL_CACHE_TTLS']):
+    for pattern, ttl in local_cache_ttls:
+        if fnmatchcase(cache_key, pattern):
+            return ttl
+    return 0
+
+
+def set_local_cached_value(cache_key, value, ttl):
+    if ttl > 0:
+        ensure_invalidation_listener()
+        local_cache.set(cache_key, value, ttl)
+
+
+def publish_invalidation(cache_key):
+    """
+    Tells the other processes to drop their local copy of a rewritten key.
+    """
+    try:
+        get_cache_db().publish(INVALIDATE_CHANNEL, '%s %s' % (get_process_id(), cache_key))
+    except Exception as ex:
+        print 'publish_invalidation, %s: %s' % (cache_key, ex)
+
+
+def get_process_id():
+    return ensure_invalidation_listener()
+
+
+def ensure_invalidation_listener():
+    """
+    Starts this process's subscriber to invalidations, once per process. A
+    forked child (RQ work horse) starts with an empty local cache since it
+    didn't inherit the parent's subscriber thread.
+    @return: id of this process in invalidation messages
+    """
+    global _process_id, _process_pid
+
+    pid = os.getpid()
+    if _process_pid == pid:
+        return _process_id
+
+    with _listener_lock:
+        if _process_pid != pid:
+            local_cache.clear()
+            _process_id = uuid.uuid4().hex
+            t = threading.Thread(target=listen_for_invalidations, args=(_process_id,))
+            t.daemon = True
+            t.start()
+            _process_pid = pid
+
+    return _process_id
+
+
+def listen_for_invalidations(process_id):
+    while True:
+        try:
+            pubsub = get_cache_db().pubsub()
+            pubsub.subscribe(INVALIDATE_CHANNEL)
+            for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                sender, cache_key = message.get('data').split(' ', 1)
+                if sender != process_id:
+                    local_cache.delete(cache_key)
+
+        except Exception as ex:
+            print 'listen_for_invalidations, %s' % ex
+
+        # invalidations may have been missed while disconnected
+        local_cache.clear()
+        time.sleep(5)
+
+
+def delete_cached_data(cache_key):
+    try:
+        get_cache_db().delete(cache_key)
+
+        if get_local_ttl(cache_key) > 0:
+            local_cache.delete(cache_key)
+            publish_invalidation(cache_key)
+    except Exception as ex:
+        print 'delete_cached_data, %s: %s' % (cache_key, ex)
+
+
+def set_cached_set(cache_key, members, expires=300):
+    try:
+        pipe = get_cache_db().pipeline()
+        pipe.delete(cache_key)
+        if members:
+            pipe.sadd(cache_key, *members)
+            pipe.expire(cache_key, expires)
+        pipe.execute()
+    except Exception as ex:
+        print 'set_cached_set, %s: %s' % (cache_key, ex)
+
+
+def is_cached_set_member(cache_key, member):
+    """
+    @return: whether member is in the cached set, or None when the set isn't cached
+    """
+    try:
+        pipe = get_cache_db().pipeline(transaction=False)
+        pipe.exists(cache_key)
+        pipe.sismember(cache_key, member)
+        exists, is_member = pipe.execute()
+        if exists:
+            return bool(is_member)
+    except Exception as ex:
+        print 'is_cached_set_member, %s: %s' % (cache_key, ex)
+
+
+def set_cached_hash(cache_key, mapping, expires=300):
+    """
+    An empty mapping is stored as an empty field, so it can be told apart
+    from a hash that isn't cached.
+    """
+    try:
+        pipe = get_cache_db().pipeline()
+        pipe.delete(cache_key)
+        pipe.hmset(cache_key, mapping or { '': '' })
+        pipe.expire(cache_key, expires)
+        pipe.execute()
+    except Exception as ex:
+        print 'set_cached_hash, %s: %s' % (cache_key, ex)
+
+
+def get_cached_hash(cache_key):
+    """
+    @return: dict of the hash's fields, or None when the hash isn't cached
+    """
+    try:
+        mapping = get_cache_db().hgetall(cache_key)
+        if mapping:
+            mapping.pop('', None)
+            return mapping
+    except Exception as ex:
+        print 'get_cached_hash, %s: %s' % (cache_key, ex)
+
+
+def update_cached_hash(cache_key, mapping, expires=300):
+    """
+    Sets some fields of a hash, keeping its other fields.
+    """
+    try:
+        if not mapping:
+            return
+        pipe = get_cache_db().pipeline()
+        pipe.hmset(cache_key, mapping)
+        pipe.expire(cache_key, expires)
+        pipe.execute()
+    except Exception as ex:
+        print 'update_cached_hash, %s: %s' % (cache_key, ex)
+
+
+def remove_cached_hash_fields(cache_key, fields):
+    """
+    @return: number of fields removed
+    """
+    try:
+        if fields:
+            return get_cache_db().hdel(cache_key, *[str(field) for field in fields])
+    except Exception as ex:
+        print 'remove_cached_hash_fields, %s: %s' % (cache_key, ex)
+    return 0
+
+
+def remove_cached_hash_fields_except(cache_key, fields):
+    """
+    @return: number of fields removed
+    """
+    try:
+        db = get_cache_db()
+        keep = set(str(field) for field in fields)
+        keep.add('')
+        remove = [field for field in db.hkeys(cache_key) if field not in keep]
+        if remove:
+            return db.hdel(cache_key, *remove)
+    except Exception as ex:
+        print 'remove_cached_hash_fields_except, %s: %s' % (cache_key, ex)
+    return 0
+
+
 def get_cached_value(cache_key):
     try:
         return get_cache_db().get(cache_key)
@@ -37,8 +437,67 @@ def set_cached_value(cache_key, value, expires=300):
 
 
 def get_cache_db():
-    redis_url = os.getenv('REDISTOGO_URL', 'redis://localhost:6379')
-    return redis.from_url(redis_url)
+    return redis.Redis(connection_pool=get_cache_pool())
+
+
+_cache_pool = None
+_cache_pool_pid = None
+_cache_pool_lock = threading.Lock()
+_inherited_cache_pools = []
+
+
+def get_cache_pool():
+    """
+    Process-wide pool of connections to redis, shared by the cache, the web
+    app and the RQ worker. Callers block for up to REDIS_POOL_TIMEOUT seconds
+    when all REDIS_MAX_CONNECTIONS are in use. A forked process (RQ work
+    horse) gets a new pool. The parent's pool is kept referenced, never
+    disconnected, since closing it would shut down the parent's sockets.
+    """
+    global _cache_pool, _cache_pool_pid
+
+    pid = os.getpid()
+    if _cache_pool_pid != pid:
+        with _cache_pool_lock:
+            if _cache_pool_pid != pid:
+                if _cache_pool is not None:
+                    _inherited_cache_pools.append(_cache_pool)
+                _cache_pool = redis.BlockingConnectionPool.from_url(cvar['REDIS_URL'],
+                                                                    max_connections=cvar['REDIS_MAX_CONNECTIONS'],
+                                                                    timeout=cvar['REDIS_POOL_TIMEOUT'],
+                                                                    socket_keepalive=True)
+                _cache_pool_pid = pid
+
+    return _cache_pool
+
+
+def get_cache_pool_stats():
+    pool = get_cache_pool()
+    available = len([c for c in list(pool.pool.queue) if c is not None])
+    created = len(pool._connections)
+    return {
+        'max_connections': pool.max_connections,
+        'created': created,
+        'in_use': created - available,
+        'available': available,
+    }
+
+
+def check_cache_db():
+    """
+    Health check of the redis connection, along with the pool's usage.
+    """
+    try:
+        start = time.time()
+        get_cache_db().ping()
+        return {
+            'ok': True,
+            'ping_ms': round((time.time() - start) * 1000, 3),
+            'pool': get_cache_pool_stats(),
+        }
+    except Exception as ex:
+        print 'check_cache_db, %s' % ex
+        return { 'ok': False, 'error': '%s' % ex }
 
 
 def get_date(date_str):
@@ -51,31 +510,114 @@ def get_date(date_str):
 
 def get_template(template_name, context):
     try:
-        template = fetch_template(template_name)
+        template = get_compiled_template(template_name)
         if template:
-            from jinja2 import Environment, PackageLoader
-            env = Environment(loader=PackageLoader('main', 'templates'))
-            env.variable_start_string = '<%='
-            env.variable_end_string = '%>'
-            return env.from_string(template).render(context)
+            return template.render(context)
 
     except Exception as ex:
         print 'get_template %s' % ex
 
 
-def fetch_template(template_name):
+_template_env = None
+_template_sources = {}
+_compiled_templates = {}
+_revalidating_templates = set()
+_templates_lock = threading.Lock()
+
+
+def get_template_env():
+    global _template_env
+    if _template_env is None:
+        from jinja2 import Environment
+        _template_env = Environment(variable_start_string='<%=', variable_end_string='%>')
+    return _template_env
+
+
+def get_compiled_template(template_name):
+    """
+    Templates are compiled once per version of their source, keyed by the
+    template's name and the hash of its source.
+    """
+    source = fetch_template(template_name)
+    if not source:
+        return None
+
+    source_hash = hashlib.md5(source.encode('utf-8') if isinstance(source, unicode) else source).hexdigest()
+
+    with _templates_lock:
+        compiled = _compiled_templates.get(template_name)
+    if compiled and compiled[0] == source_hash:
+        return compiled[1]
+
+    template = get_template_env().from_string(source)
+    with _templates_lock:
+        _compiled_templates[template_name] = (source_hash, template)
+    return template
+
+
+def fetch_template(template_name, max_age=cvar['TEMPLATE_MAX_AGE']):
+    """
+    Returns this process's copy of the template's source. Once it's older
+    than max_age seconds, the stale copy is still returned while a background
+    thread fetches it again, so rendering never waits on the remote template.
+    """
+    with _templates_lock:
+        entry = _template_sources.get(template_name)
+
+    if entry is None:
+        return load_template(template_name)
+
+    if time.time() - entry[1] > max_age:
+        revalidate_template(template_name)
+
+    return entry[0]
+
+
+def revalidate_template(template_name):
+    with _templates_lock:
+        if template_name in _revalidating_templates:
+            return
+        _revalidating_templates.add(template_name)
+
+    def revalidate():
+        try:
+            load_template(template_name)
+        finally:
+            with _templates_lock:
+                _revalidating_templates.discard(template_name)
+
+    t = threading.Thread(target=revalidate)
+    t.daemon = True
+    t.start()
+
+
+def load_template(template_name):
     try:
         cache_key = 'template:%s' % (template_name)
         template = get_cached_value(cache_key)
         if not template:
-            template = requests.get(cvar[template_name]).text
+            template = requests.get(cvar[template_name], timeout=cvar['TEMPLATE_TIMEOUT']).text
             if template:
-                set_cached_value(cache_key, template, 300)
+                set_cached_value(cache_key, template, cvar['TEMPLATE_MAX_AGE'])
+
+        if template:
+            with _templates_lock:
+                _template_sources[template_name] = (template, time.time())
 
         return template
 
     except Exception as ex:
-        print 'fetch_template, %s: %s' % (template_name, ex)
+        print 'load_template, %s: %s' % (template_name, ex)
+
+
+def warm_templates():
+    """
+    Loads and compiles every configured template, so the first responses
+    don't wait on them.
+    """
+    for template_name in sorted(TEMPLATE_VARS):
+        if cvar.get(template_name):
+            get_compiled_template(template_name)
 
 
 def remove_none(data):
@@ -1,13 +1,14 @@
-import os
-import redis
+import util
 from rq import Worker, Queue, Connection
 
 listen = ['high', 'default', 'low']
-redis_url = os.getenv('REDISTOGO_URL', 'redis://localhost:6379')
-conn = redis.from_url(redis_url)
+conn = util.get_cache_db()
 q = Queue(connection=conn)
 
 if __name__ == '__main__':
+    # compiled once here, and inherited by every forked work horse
+    util.warm_templates()
+
     with Connection(conn):
         worker = Worker(map(Queue, listen))
         worker.work()